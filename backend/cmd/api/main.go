@@ -80,6 +80,7 @@ func main() {
 	router := gin.Default()
 	router.GET("/healthy", handler.HealthCheck)
 	router.POST("/api/v1/predict", handler.Predict)
+	router.POST("/api/v1/predict_batch", handler.PredictBatch)
 
 	port := getEnv("PORT", "8080")
 	log.Printf("Server starting on :%s", port)
@@ -0,0 +1,88 @@
+// backend/internal/handlers/cache.go
+/*
+ * This file defines a small in-memory cache of recent predictions.
+ *
+ * Predictions are keyed by a hash of the uploaded image bytes, which doubles
+ * as the response's ETag. A client that re-submits an image it has already
+ * sent can then be answered with "304 Not Modified" instead of running the
+ * model again.
+ */
+
+package handlers
+
+import (
+	"encoding/hex"
+	"hash"
+	"strings"
+	"sync"
+
+	"github.com/josephed37/mammoscan-AI/backend/internal/models"
+	"golang.org/x/crypto/blake2b"
+)
+
+// predictionCacheSize caps how many predictions are remembered at once.
+const predictionCacheSize = 1024
+
+// PredictionCache remembers recent predictions by image hash. It is safe for
+// concurrent use and evicts the oldest entry once it is full.
+type PredictionCache struct {
+	mu       sync.Mutex
+	capacity int
+	entries  map[string]models.PredictionResponse
+	order    []string
+}
+
+// NewPredictionCache creates an empty cache holding at most `capacity` predictions.
+func NewPredictionCache(capacity int) *PredictionCache {
+	return &PredictionCache{
+		capacity: capacity,
+		entries:  make(map[string]models.PredictionResponse, capacity),
+	}
+}
+
+// Get returns the cached prediction for an image hash, if there is one.
+func (pc *PredictionCache) Get(key string) (models.PredictionResponse, bool) {
+	pc.mu.Lock()
+	defer pc.mu.Unlock()
+	prediction, ok := pc.entries[key]
+	return prediction, ok
+}
+
+// Add stores the prediction for an image hash, evicting the oldest entry if needed.
+func (pc *PredictionCache) Add(key string, prediction models.PredictionResponse) {
+	pc.mu.Lock()
+	defer pc.mu.Unlock()
+	if _, ok := pc.entries[key]; !ok {
+		if len(pc.order) >= pc.capacity {
+			delete(pc.entries, pc.order[0])
+			pc.order = pc.order[1:]
+		}
+		pc.order = append(pc.order, key)
+	}
+	pc.entries[key] = prediction
+}
+
+// newImageHasher returns the hash used to key predictions: a 128-bit BLAKE2b,
+// hex-encoded by imageKey. Clients compute the same hash for If-None-Match.
+func newImageHasher() hash.Hash {
+	hasher, _ := blake2b.New(16, nil) // Only fails for invalid sizes or keys.
+	return hasher
+}
+
+// imageKey returns the hex-encoded digest of a hasher fed with an image's bytes.
+func imageKey(hasher hash.Hash) string {
+	return hex.EncodeToString(hasher.Sum(nil))
+}
+
+// parseETags returns the entity tags listed in an If-None-Match header,
+// without quotes or weak-validator prefixes.
+func parseETags(header string) []string {
+	var tags []string
+	for _, tag := range strings.Split(header, ",") {
+		tag = strings.Trim(strings.TrimPrefix(strings.TrimSpace(tag), "W/"), `"`)
+		if tag != "" {
+			tags = append(tags, tag)
+		}
+	}
+	return tags
+}
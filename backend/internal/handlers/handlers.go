@@ -14,20 +14,41 @@
 package handlers
 
 import (
+	"encoding/json"
 	"fmt"
+	"io"
+	"mime/multipart"
 	"net/http"
+	"strings"
+	"sync"
 
 	"github.com/gin-gonic/gin"
 	"github.com/josephed37/mammoscan-AI/backend/internal/inference"
 	"github.com/josephed37/mammoscan-AI/backend/internal/models"
 	"github.com/josephed37/mammoscan-AI/backend/internal/preprocess"
+	"gorgonia.org/tensor"
 )
 
+// modelThreshold is the optimal decision threshold we found during our analysis.
+const modelThreshold = 0.110593
+
+// modelName identifies the model that produces our predictions.
+const modelName = "baseline_cnn_v2"
+
+// maxBatchSize caps how many images a single batch request may contain.
+const maxBatchSize = 16
+
+// maxDrainBytes caps how much of an unread upload we read and discard before
+// answering from the cache. Larger bodies are left unread and the connection
+// is closed instead.
+const maxDrainBytes = 32 << 20
+
 // Handler is a struct that holds dependencies for our API handlers,
 // such as the inference engine. This is a form of dependency injection,
 // which makes our code modular and easier to test.
 type Handler struct {
 	InferenceEngine *inference.ONNXInference
+	Predictions     *PredictionCache
 }
 
 // NewHandler is a constructor function that creates a new Handler
@@ -35,6 +56,7 @@ type Handler struct {
 func NewHandler(inferenceEngine *inference.ONNXInference) *Handler {
 	return &Handler{
 		InferenceEngine: inferenceEngine,
+		Predictions:     NewPredictionCache(predictionCacheSize),
 	}
 }
 
@@ -48,32 +70,75 @@ func (h *Handler) HealthCheck(c *gin.Context) {
 // entire process of receiving an image, preprocessing it, running inference,
 // and returning a structured JSON response.
 func (h *Handler) Predict(c *gin.Context) {
-	// --- 1. Receive and Validate the Image Upload ---
-	// c.FormFile retrieves the uploaded file from the "image" field of the multipart form.
-	fileHeader, err := c.FormFile("image")
-	if err != nil {
-		// If no file is found, return a 400 Bad Request error.
-		c.JSON(http.StatusBadRequest, models.ErrorResponse{Error: "image file is required"})
-		return
+	// --- 0. Answer Repeat Requests From the Cache ---
+	// Every response carries the image's hash as its ETag. A client that sends
+	// it back in If-None-Match for an image we've already scored gets a
+	// "304 Not Modified", with the cached prediction in the X-Prediction header,
+	// without the image being decoded or the model running again.
+	for _, tag := range parseETags(c.GetHeader("If-None-Match")) {
+		if cached, ok := h.Predictions.Get(tag); ok {
+			cachedJSON, err := json.Marshal(cached)
+			if err == nil {
+				// The client is still sending the image, so read the rest of the
+				// upload first; answering mid-upload can make the server close the
+				// connection before the client reads our response.
+				io.Copy(io.Discard, io.LimitReader(c.Request.Body, maxDrainBytes))
+				c.Header("ETag", `"`+tag+`"`)
+				c.Header("X-Prediction", string(cachedJSON))
+				c.Status(http.StatusNotModified)
+				return
+			}
+		}
 	}
 
-	// Open the file to get an io.Reader, which allows us to process the file's contents.
-	file, err := fileHeader.Open()
-	if err != nil {
-		c.JSON(http.StatusInternalServerError, models.ErrorResponse{Error: "failed to open uploaded file"})
-		return
+	// --- 1. Receive and Validate the Image Upload ---
+	// The image can arrive as the "image" field of a multipart form, or as the
+	// raw request body (e.g. Content-Type: image/jpeg), which spares both sides
+	// the multipart encoding.
+	var file io.Reader
+	if strings.HasPrefix(c.ContentType(), "multipart/") {
+		// c.FormFile retrieves the uploaded file from the "image" field of the multipart form.
+		fileHeader, err := c.FormFile("image")
+		if err != nil {
+			// If no file is found, return a 400 Bad Request error.
+			c.JSON(http.StatusBadRequest, models.ErrorResponse{Error: "image file is required"})
+			return
+		}
+
+		// Open the file to get an io.Reader, which allows us to process the file's contents.
+		uploadedFile, err := fileHeader.Open()
+		if err != nil {
+			c.JSON(http.StatusInternalServerError, models.ErrorResponse{Error: "failed to open uploaded file"})
+			return
+		}
+		// We use defer to ensure the file is closed when the function exits.
+		defer uploadedFile.Close()
+		file = uploadedFile
+	} else {
+		if c.Request.ContentLength == 0 {
+			c.JSON(http.StatusBadRequest, models.ErrorResponse{Error: "image file is required"})
+			return
+		}
+		// The request body is decoded as it streams in.
+		file = c.Request.Body
 	}
-	// We use defer to ensure the file is closed when the function exits.
-	defer file.Close()
 
 	// --- 2. Preprocess the Image ---
 	// We pass the file to our preprocessing pipeline, which decodes, resizes,
-	// and converts the image into the tensor format our model expects.
-	inputTensor, err := preprocess.PreprocessImage(file)
+	// and converts the image into the tensor format our model expects. The
+	// bytes are hashed as they are read, to key the prediction cache.
+	hasher := newImageHasher()
+	inputTensor, err := preprocess.PreprocessImage(io.TeeReader(file, hasher))
 	if err != nil {
 		c.JSON(http.StatusInternalServerError, models.ErrorResponse{Error: fmt.Sprintf("failed to preprocess image: %v", err)})
 		return
 	}
+	// The decoder may stop before the end of the file, so hash whatever is left.
+	if _, err := io.Copy(hasher, file); err != nil {
+		c.JSON(http.StatusInternalServerError, models.ErrorResponse{Error: fmt.Sprintf("failed to read image: %v", err)})
+		return
+	}
+	key := imageKey(hasher)
 
 	// --- 3. Run Inference ---
 	// The preprocessed tensor is passed to our ONNX model's predict method.
@@ -88,24 +153,85 @@ func (h *Handler) Predict(c *gin.Context) {
 	confidenceScore := float64(prediction[0])
 
 	// --- 4. Apply Threshold and Format the Response ---
-	// This is where we apply the optimal decision threshold we found during our analysis.
-	const modelThreshold = 0.110593
-	var finalPrediction string
+	response := newPredictionResponse(confidenceScore)
+	h.Predictions.Add(key, response)
 
+	// Finally, we send the structured JSON response back to the client with a 200 OK status.
+	c.Header("ETag", `"`+key+`"`)
+	c.JSON(http.StatusOK, response)
+}
+
+// PredictBatch handles several images uploaded in one multipart request
+// (repeated "images" fields). Answering them together saves clients one HTTP
+// round trip per image. Images are decoded and resized concurrently, then run
+// through the model one at a time, since the inference graph holds a single input.
+// Predictions are returned in upload order.
+func (h *Handler) PredictBatch(c *gin.Context) {
+	// --- 1. Receive and Validate the Image Uploads ---
+	form, err := c.MultipartForm()
+	if err != nil || len(form.File["images"]) == 0 {
+		c.JSON(http.StatusBadRequest, models.ErrorResponse{Error: "at least one image file is required"})
+		return
+	}
+	fileHeaders := form.File["images"]
+	if len(fileHeaders) > maxBatchSize {
+		c.JSON(http.StatusBadRequest, models.ErrorResponse{Error: fmt.Sprintf("at most %d images are allowed per batch", maxBatchSize)})
+		return
+	}
+
+	// --- 2. Preprocess the Images Concurrently ---
+	inputTensors := make([]tensor.Tensor, len(fileHeaders))
+	preprocessErrs := make([]error, len(fileHeaders))
+	var wg sync.WaitGroup
+	for i, fileHeader := range fileHeaders {
+		wg.Add(1)
+		go func(i int, fileHeader *multipart.FileHeader) {
+			defer wg.Done()
+			inputTensors[i], preprocessErrs[i] = preprocessUpload(fileHeader)
+		}(i, fileHeader)
+	}
+	wg.Wait()
+
+	// --- 3. Run Inference and Format the Responses ---
+	predictions := make([]models.PredictionResponse, 0, len(fileHeaders))
+	for i, inputTensor := range inputTensors {
+		if preprocessErrs[i] != nil {
+			c.JSON(http.StatusInternalServerError, models.ErrorResponse{Error: fmt.Sprintf("failed to preprocess image %q: %v", fileHeaders[i].Filename, preprocessErrs[i])})
+			return
+		}
+		prediction, err := h.InferenceEngine.Predict(inputTensor)
+		if err != nil {
+			c.JSON(http.StatusInternalServerError, models.ErrorResponse{Error: fmt.Sprintf("prediction failed for image %q: %v", fileHeaders[i].Filename, err)})
+			return
+		}
+		predictions = append(predictions, newPredictionResponse(float64(prediction[0])))
+	}
+
+	c.JSON(http.StatusOK, models.BatchPredictionResponse{Predictions: predictions})
+}
+
+// preprocessUpload opens one uploaded file and converts it into the model's input tensor.
+func preprocessUpload(fileHeader *multipart.FileHeader) (tensor.Tensor, error) {
+	file, err := fileHeader.Open()
+	if err != nil {
+		return nil, fmt.Errorf("failed to open uploaded file: %w", err)
+	}
+	defer file.Close()
+	return preprocess.PreprocessImage(file)
+}
+
+// newPredictionResponse applies our decision threshold to a confidence score
+// and builds the response describing the prediction.
+func newPredictionResponse(confidenceScore float64) models.PredictionResponse {
+	finalPrediction := "Non-Cancer"
 	if confidenceScore > modelThreshold {
 		finalPrediction = "Cancer"
-	} else {
-		finalPrediction = "Non-Cancer"
 	}
 
-	// We populate our response struct with the final results.
-	response := models.PredictionResponse{
+	return models.PredictionResponse{
 		Prediction:      finalPrediction,
 		ConfidenceScore: confidenceScore,
-		ModelName:       "baseline_cnn_v2",
+		ModelName:       modelName,
 		ModelThreshold:  modelThreshold,
 	}
-
-	// Finally, we send the structured JSON response back to the client with a 200 OK status.
-	c.JSON(http.StatusOK, response)
 }
@@ -30,6 +30,12 @@ type PredictionResponse struct {
 	ModelThreshold float64 `json:"model_threshold"`
 }
 
+// BatchPredictionResponse defines the JSON response for a batch prediction.
+// Predictions are listed in the same order as the uploaded images.
+type BatchPredictionResponse struct {
+	Predictions []PredictionResponse `json:"predictions"`
+}
+
 // ErrorResponse defines a standard structure for all error messages
 // returned by the API. This ensures errors are consistent and easy for clients to parse.
 type ErrorResponse struct {
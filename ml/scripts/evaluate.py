@@ -2,8 +2,8 @@
 """
 This script provides the final, unbiased evaluation of a trained model.
 
-It uses a "specialist function" approach, where each model type has its own
-dedicated evaluation logic to ensure clarity and robustness.
+The model is restored straight from its saved `.keras` file, so the same
+script evaluates every architecture without rebuilding it by hand.
 """
 
 # ml/scripts/evaluate.py
@@ -15,7 +15,6 @@ import json
 import argparse
 import numpy as np
 import tensorflow as tf
-from sklearn.metrics import classification_report
 
 # --- Path Setup ---
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -24,8 +23,8 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 # --- Custom Modules ---
-# Import our trusted model-building functions
-from ml.src.model import build_full_model, create_regularized_transfer_model
+from ml.src.data_utils import load_image_paths
+from ml.src.dataset_utils import load_split_dataset, prepare_dataset
 
 
 # --- Constants ---
@@ -35,7 +34,7 @@ IMG_WIDTH = 224
 BATCH_SIZE = 32
 CLASS_NAMES = ['Non-Cancer', 'Cancer'] # Class 0, Class 1
 
-def evaluate_model(model_name, model_path, report_path, threshold):
+def evaluate_model(model_path, report_path, threshold):
     """
     Loads a trained model, evaluates it on the test set, and saves metrics.
     """
@@ -43,49 +42,98 @@ def evaluate_model(model_name, model_path, report_path, threshold):
     
     # --- 1. Load Data ---
     print("Loading test dataset...")
-    test_dataset = tf.keras.utils.image_dataset_from_directory(
-        os.path.join(PROCESSED_DATA_DIR, 'test'),
-        image_size=(IMG_HEIGHT, IMG_WIDTH),
-        batch_size=BATCH_SIZE,
-        label_mode='binary',
-        shuffle=False
-    )
-    # Remap labels to match training (Cancer=1)
-    test_dataset = test_dataset.map(lambda x, y: (x, 1 - y))
-
-    # Apply preprocessing if required by the model
-    if model_name == 'transfer':
-        preprocess_input = tf.keras.applications.efficientnet.preprocess_input
-        test_dataset = test_dataset.map(lambda x, y: (preprocess_input(x), y))
-
-    # --- 2. Build, Compile, and Load Weights (The Robust Method) ---
-    print(f"Re-creating '{model_name}' model architecture...")
-    if model_name == 'baseline':
-        # The baseline model was trained with augmentation layers, so we build that structure
-        model = build_full_model(input_shape=(IMG_HEIGHT, IMG_WIDTH, 3))
-    elif model_name == 'transfer':
-        # The transfer model was trained with dropout, so we build that structure
-        model = create_regularized_transfer_model(input_shape=(IMG_HEIGHT, IMG_WIDTH, 3))
-    
-    print("Compiling model for evaluation...")
-    model.compile(metrics=['accuracy', tf.keras.metrics.Recall(name='recall')])
-    
-    print(f"Loading weights from {model_path}...")
-    model.load_weights(model_path)
+    test_dataset = load_split_dataset(PROCESSED_DATA_DIR, 'test', (IMG_HEIGHT, IMG_WIDTH), shuffle=False)
+    num_samples = len(load_image_paths(os.path.join(PROCESSED_DATA_DIR, 'test')))
+
+    # Remap labels to match training (Cancer=1). Order is kept so labels line
+    # up with predictions. No model-specific preprocessing is needed: the
+    # EfficientNet `preprocess_input` is a pass-through, since that model
+    # normalizes its inputs inside its own layers.
+    test_dataset = prepare_dataset(test_dataset, BATCH_SIZE, deterministic=True)
+
+    # --- 2. Load the Trained Model ---
+    # The `.keras` file stores the architecture alongside the weights, so we
+    # restore it in one step instead of rebuilding it layer by layer. It is
+    # only used for inference, so there is no need to compile it.
+    print(f"Loading model from {model_path}...")
+    model = tf.keras.models.load_model(model_path, compile=False)
     print("✅ Model loaded successfully.")
 
     # --- 3. Get Predictions ---
-    true_labels = np.concatenate([y for x, y in test_dataset], axis=0)
-    raw_predictions = model.predict(test_dataset)
-    predicted_labels = (raw_predictions > threshold).astype(int)
+    # A single sweep collects labels and predictions together, so the test set
+    # is only read and decoded once. Calling the model directly skips the
+    # per-batch callback overhead of `model.predict`. The threshold is applied
+    # on the device, so only one byte per sample is copied back to the host.
+    # The forward pass is traced once for our fixed input shape and compiled
+    # with XLA; the last batch is padded to full size so that one compiled
+    # kernel serves every batch. Images stay uint8 until the model casts them.
+    @tf.function(
+        input_signature=[tf.TensorSpec((None, IMG_HEIGHT, IMG_WIDTH, 3), tf.uint8)],
+        jit_compile=True
+    )
+    def predict_labels(images):
+        return tf.cast(model(images, training=False) > threshold, tf.uint8)
+
+    true_labels = np.empty((num_samples, 1), dtype=np.uint8)
+    predicted_labels = np.empty((num_samples, 1), dtype=np.uint8)
+    offset = 0
+    for x_batch, y_batch in test_dataset:
+        batch_len = len(y_batch)
+        if batch_len < BATCH_SIZE:
+            x_batch = tf.pad(x_batch, [[0, BATCH_SIZE - batch_len], [0, 0], [0, 0], [0, 0]])
+        batch_predictions = predict_labels(x_batch)[:batch_len]
+        predicted_labels[offset:offset + batch_len] = batch_predictions.numpy()
+        true_labels[offset:offset + batch_len] = y_batch.numpy()
+        offset += batch_len
+    true_labels, predicted_labels = true_labels[:offset], predicted_labels[:offset]
 
     # --- 4. Generate and Save Report ---
     save_report(model_path, threshold, true_labels, predicted_labels, report_path)
 
+def _class_metrics(tp, fp, fn):
+    """Returns precision, recall, and F1 for one class (0.0 when undefined)."""
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+def binary_classification_report(true_labels, predicted_labels):
+    """
+    Builds the same dictionary as sklearn's `classification_report(..., output_dict=True)`
+    for our two classes, straight from the four confusion-matrix counts.
+    """
+    y_true = np.asarray(true_labels).ravel().astype(bool)
+    y_pred = np.asarray(predicted_labels).ravel().astype(bool)
+
+    tp = int(np.count_nonzero(y_true & y_pred))
+    fp = int(np.count_nonzero(~y_true & y_pred))
+    fn = int(np.count_nonzero(y_true & ~y_pred))
+    tn = len(y_true) - tp - fp - fn
+
+    # Class 0 (Non-Cancer) sees the same matrix with positives and negatives swapped.
+    supports = {CLASS_NAMES[0]: tn + fp, CLASS_NAMES[1]: tp + fn}
+    metrics = {CLASS_NAMES[0]: _class_metrics(tn, fn, fp), CLASS_NAMES[1]: _class_metrics(tp, fp, fn)}
+
+    report = {}
+    for name in CLASS_NAMES:
+        precision, recall, f1 = metrics[name]
+        report[name] = {'precision': precision, 'recall': recall, 'f1-score': f1, 'support': float(supports[name])}
+
+    total = len(y_true)
+    report['accuracy'] = (tp + tn) / total if total else 0.0
+    for avg_name, weights in (('macro avg', {n: 1 / len(CLASS_NAMES) for n in CLASS_NAMES}),
+                              ('weighted avg', {n: supports[n] / total if total else 0.0 for n in CLASS_NAMES})):
+        report[avg_name] = {
+            key: sum(report[n][key] * weights[n] for n in CLASS_NAMES)
+            for key in ('precision', 'recall', 'f1-score')
+        }
+        report[avg_name]['support'] = float(total)
+    return report
+
 def save_report(model_path, threshold, true_labels, predicted_labels, report_path):
     """Calculates metrics and saves them to a JSON file."""
     print("\n--- Generating Final Report ---")
-    report_dict = classification_report(true_labels, predicted_labels, target_names=CLASS_NAMES, output_dict=True)
+    report_dict = binary_classification_report(true_labels, predicted_labels)
     
     final_metrics = {
         'model_path': model_path,
@@ -103,7 +151,6 @@ def save_report(model_path, threshold, true_labels, predicted_labels, report_pat
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Evaluate a trained model.")
-    parser.add_argument("--model-name", type=str, required=True, choices=['baseline', 'transfer'])
     parser.add_argument("--model-path", type=str, required=True)
     parser.add_argument("--report-path", type=str, required=True)
     parser.add_argument(
@@ -115,4 +162,4 @@ if __name__ == '__main__':
 
     
     args = parser.parse_args()
-    evaluate_model(args.model_name, args.model_path, args.report_path, args.threshold)
\ No newline at end of file
+    evaluate_model(args.model_path, args.report_path, args.threshold)
\ No newline at end of file
@@ -10,9 +10,13 @@ our Python-trained model in a Go application.
 import os
 import sys
 import argparse
+import numpy as np
 import tensorflow as tf
 import tf2onnx
 
+# The ONNX graph optimizer and the INT8/FP16 tooling are imported where they
+# are used, so a plain FP32 export doesn't need them installed.
+
 # --- Path Setup ---
 # This ensures the script can find our custom modules in ml/src.
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -22,31 +26,132 @@ if project_root not in sys.path:
 
 # --- Custom Modules ---
 # Import our model-building functions to reconstruct the architecture.
-from ml.src.model import build_full_model, create_baseline_cnn
+from ml.src.model import cnn_weights_path, create_baseline_cnn
+
+# --- Constants ---
+CALIBRATION_DATA_DIR = os.path.join(project_root, 'data', 'processed', 'val')
+CALIBRATION_SAMPLES = 500
+DEFAULT_OPSET = 17
+# Graph rewrites applied after conversion: fold BatchNorm and bias adds into
+# the preceding Conv and drop no-op nodes, so runtimes launch fewer kernels.
+OPTIMIZER_PASSES = [
+    'fuse_bn_into_conv',
+    'fuse_add_bias_into_conv',
+    'fuse_consecutive_transposes',
+    'eliminate_identity',
+    'eliminate_nop_transpose',
+]
+
+def load_calibration_samples(data_dir, input_name="input", input_dtype=np.float32, max_samples=CALIBRATION_SAMPLES):
+    """Returns up to `max_samples` validation images as ONNX Runtime input feeds."""
+    dataset = tf.keras.utils.image_dataset_from_directory(
+        data_dir,
+        labels=None,
+        image_size=(224, 224),
+        batch_size=1,
+        shuffle=False
+    )
+    # The model takes raw 0-255 pixels, so only the dtype may need adjusting.
+    return [{input_name: image.numpy().astype(input_dtype)} for image in dataset.take(max_samples)]
+
+def optimize_onnx_graph(onnx_model_path):
+    """Runs shape inference and graph fusion passes, saving the result in place."""
+    import onnx
+    try:
+        import onnxoptimizer
+    except ImportError:
+        print("⚠️ Skipping ONNX graph optimization: onnxoptimizer is not installed.")
+        return
+
+    print("Optimizing ONNX graph...")
+    onnx.shape_inference.infer_shapes_path(onnx_model_path)
+    optimized_model = onnxoptimizer.optimize(onnx.load(onnx_model_path), OPTIMIZER_PASSES)
+    onnx.save(optimized_model, onnx_model_path)
+    print("✅ ONNX graph optimized.")
+
+def quantize_to_int8(onnx_model_path, calibration_dir=CALIBRATION_DATA_DIR, input_dtype=np.float32):
+    """Writes a statically quantized INT8 (QDQ) copy of the ONNX model next to it."""
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        CalibrationMethod,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+
+    class ValidationDataReader(CalibrationDataReader):
+        """Feeds validation images, one at a time, to the INT8 calibrator."""
+
+        def __init__(self, samples):
+            self._samples = iter(samples)
 
-def export_to_onnx(keras_model_path, onnx_model_path):
+        def get_next(self):
+            return next(self._samples, None)
+
+    int8_model_path = os.path.splitext(onnx_model_path)[0] + '.int8.onnx'
+    print(f"Quantizing model to INT8 using calibration images from {calibration_dir}...")
+    quantize_static(
+        onnx_model_path,
+        int8_model_path,
+        calibration_data_reader=ValidationDataReader(
+            load_calibration_samples(calibration_dir, input_dtype=input_dtype)
+        ),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QInt8,
+        weight_type=QuantType.QInt8,
+        calibrate_method=CalibrationMethod.MinMax
+    )
+    print(f"✅ INT8 model saved to: {int8_model_path}")
+
+def convert_to_fp16(onnx_model_path):
+    """Writes an FP16 copy of the ONNX model for GPU deployment."""
+    import onnx
+    from onnxconverter_common import float16
+
+    fp16_model_path = os.path.splitext(onnx_model_path)[0] + '.fp16.onnx'
+    # `keep_io_types` keeps float32 inputs/outputs so callers don't need to change.
+    fp16_model = float16.convert_float_to_float16(onnx.load(onnx_model_path), keep_io_types=True)
+    onnx.save(fp16_model, fp16_model_path)
+    print(f"✅ FP16 model saved to: {fp16_model_path}")
+
+def export_to_onnx(keras_model_path, onnx_model_path, opset=DEFAULT_OPSET, uint8_input=False,
+                   int8=False, fp16=False):
     """Loads a Keras model's weights and saves its core architecture in ONNX format."""
     print(f"--- 🚀 Starting ONNX Export ---")
     
-    # --- Step 1: Load the Full Training Model to Access Weights ---
-    print("Loading full training model to access weights...")
-    # We build the full training architecture (including augmentation layers)
-    # so that we can correctly load the weights from the saved file.
-    full_training_model = build_full_model(input_shape=(224, 224, 3))
-    full_training_model.load_weights(keras_model_path)
+    # --- Step 1: Load the Trained CNN Weights ---
+    weights_path = cnn_weights_path(keras_model_path)
+    if os.path.exists(weights_path):
+        # Training saves the core CNN's weights on their own, so we can load
+        # them straight into a clean CNN.
+        print(f"Loading CNN weights from {weights_path}...")
+        trained_cnn = create_baseline_cnn(input_shape=(224, 224, 3))
+        trained_cnn.load_weights(weights_path)
+    else:
+        # Without a weights-only file we load the full checkpoint instead.
+        # Older checkpoints wrap the CNN behind augmentation layers, so we
+        # extract the core CNN part when it isn't the model itself.
+        print("Loading full training model to access weights...")
+        full_training_model = tf.keras.models.load_model(keras_model_path, compile=False)
+        trained_cnn = (full_training_model if full_training_model.name == 'baseline_cnn'
+                       else full_training_model.get_layer('baseline_cnn'))
     print("✅ Keras model weights loaded successfully.")
 
-    # Extract the core CNN part, which contains the learned weights we care about.
-    trained_cnn = full_training_model.layers[1]
-
     # --- Step 2: Create a Clean Inference-Only Model (The "Blueprint Transfer") ---
     # To avoid compatibility issues, we create a fresh, clean model that only
-    # contains the layers needed for inference (no augmentation).
+    # contains the layers needed for inference.
     print("Building a clean, functional-API model for conversion...")
     # We use the Keras Functional API because it's more explicit and robust for conversion.
-    inputs = tf.keras.Input(shape=(224, 224, 3), name="input")
+    input_dtype = tf.uint8 if uint8_input else tf.float32
+    inputs = tf.keras.Input(shape=(224, 224, 3), dtype=input_dtype, name="input")
+    x = inputs
+    if uint8_input:
+        # Accept raw uint8 pixels and cast inside the graph, so clients send
+        # a quarter of the bytes and do no conversion work of their own.
+        x = tf.keras.layers.Lambda(lambda t: tf.cast(t, tf.float32), name="cast_to_float")(x)
     # We then take our extracted, trained CNN and "call" it on the new inputs.
-    outputs = trained_cnn(inputs)
+    outputs = trained_cnn(x)
     # This creates a new model with a clean graph, perfect for the ONNX converter.
     inference_model = tf.keras.Model(inputs, outputs)
     print("✅ Functional model created successfully.")
@@ -54,16 +159,31 @@ def export_to_onnx(keras_model_path, onnx_model_path):
     # --- Step 3: Convert the Clean Model to ONNX ---
     print(f"Converting model to ONNX format...")
     # We define the input signature, telling ONNX to expect a batch of images of our chosen size.
-    spec = (tf.TensorSpec((None, 224, 224, 3), tf.float32, name="input"),)
+    spec = (tf.TensorSpec((None, 224, 224, 3), input_dtype, name="input"),)
     
-    # The main conversion call. Opset 13 is a stable and widely supported version.
-    tf2onnx.convert.from_keras(inference_model, input_signature=spec, opset=13, output_path=onnx_model_path)
+    # The main conversion call. Opset 17 gives runtimes richer fused ops to work with.
+    tf2onnx.convert.from_keras(inference_model, input_signature=spec, opset=opset, output_path=onnx_model_path)
+    optimize_onnx_graph(onnx_model_path)
 
     # --- Step 4: Verify the output ---
     if os.path.exists(onnx_model_path):
         print(f"✅ Model successfully converted and saved to: {onnx_model_path}")
     else:
         print(f"🔥 Error: ONNX model conversion failed.")
+        return
+
+    # --- Step 5: Emit Reduced-Precision Variants (Optional) ---
+    # The FP32 model stays the default for the Go backend; the INT8 and FP16
+    # copies are smaller and faster on runtimes with quantized/half kernels.
+    # INT8 calibration needs the processed validation images, so it is
+    # skipped (without failing the export) on machines that don't have them.
+    if int8:
+        if os.path.isdir(CALIBRATION_DATA_DIR):
+            quantize_to_int8(onnx_model_path, input_dtype=np.uint8 if uint8_input else np.float32)
+        else:
+            print(f"⚠️ Skipping INT8 export: calibration images not found at {CALIBRATION_DATA_DIR}.")
+    if fp16:
+        convert_to_fp16(onnx_model_path)
 
 
 if __name__ == '__main__':
@@ -77,10 +197,19 @@ if __name__ == '__main__':
 
     parser.add_argument("--keras-path", type=str, default=default_keras_path)
     parser.add_argument("--onnx-path", type=str, default=default_onnx_path)
+    parser.add_argument("--opset", type=int, default=DEFAULT_OPSET)
+    # The Go backend feeds float32 tensors, so uint8 input is opt-in.
+    parser.add_argument("--uint8-input", action="store_true",
+                        help="Export a model that takes uint8 pixels and casts them in-graph.")
+    parser.add_argument("--int8", action="store_true",
+                        help="Also write an INT8 model, calibrated on the processed validation images.")
+    parser.add_argument("--fp16", action="store_true",
+                        help="Also write an FP16 model for GPU deployment.")
 
     args = parser.parse_args()
     
     # Ensure the output directory exists before saving.
     os.makedirs(os.path.dirname(args.onnx_path), exist_ok=True)
     
-    export_to_onnx(args.keras_path, args.onnx_path)
\ No newline at end of file
+    export_to_onnx(args.keras_path, args.onnx_path, opset=args.opset, uint8_input=args.uint8_input,
+                   int8=args.int8, fp16=args.fp16)
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""
+This script prepares the raw mammogram images for training.
+
+It splits the original images into train, validation, and test sets,
+then resizes and saves each split into `data/processed/<split>/<label>`,
+the layout our training and evaluation scripts expect.
+"""
+
+import os
+import sys
+import hashlib
+from glob import glob
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from sklearn.model_selection import StratifiedShuffleSplit
+
+# --- Path Setup ---
+# This ensures the script can find our custom modules in ml/src.
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(script_dir, '..', '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+# --- Custom Modules ---
+from ml.src.data_utils import load_image_paths
+from ml.src.dataset_utils import TFRECORD_DIR_NAME
+from ml.src.preprocess_utils import (
+    PNG_WRITE_PARAMS,
+    PROCESSING_VERSION,
+    SAVE_EXT,
+    TARGET_SIZE,
+    process_dataframe,
+)
+
+# --- Constants ---
+RAW_DATA_DIR = os.path.join(project_root, 'data', 'raw')
+PROCESSED_DATA_DIR = os.path.join(project_root, 'data', 'processed')
+TEST_SIZE = 0.15
+VAL_SIZE = 0.15
+RANDOM_STATE = 42
+SENTINEL_PATH = os.path.join(PROCESSED_DATA_DIR, '.sentinel')
+
+def compute_preprocessing_key():
+    """
+    Returns a hash of everything that determines the processed output: the
+    raw files and their modification times, the split settings, and the
+    processing version and output settings.
+    """
+    raw_files = sorted(
+        (path, os.path.getmtime(path))
+        for path in glob(os.path.join(RAW_DATA_DIR, '**', '*'), recursive=True)
+    )
+    settings = repr((
+        TEST_SIZE, VAL_SIZE, RANDOM_STATE,
+        PROCESSING_VERSION, TARGET_SIZE, SAVE_EXT, PNG_WRITE_PARAMS,
+    ))
+    return hashlib.blake2b(repr(raw_files).encode() + settings.encode()).hexdigest()
+
+def main():
+    """Runs the full preprocessing pipeline: load, split, resize, and save."""
+    print("--- 🧹 Starting Data Preprocessing ---")
+
+    # --- Step 0: Skip If Nothing Changed ---
+    # Rewriting every processed image is expensive, so we compare against the
+    # key stored by the last successful run.
+    key = compute_preprocessing_key()
+    if os.path.exists(SENTINEL_PATH):
+        with open(SENTINEL_PATH) as f:
+            if f.read().strip() == key:
+                print("✅ Already up to date. Processed data matches the raw data and split settings.")
+                return
+
+    # --- Step 1: Load All Image Paths ---
+    df = load_image_paths(RAW_DATA_DIR)
+    print(f"Found {len(df)} images in {RAW_DATA_DIR}")
+
+    # --- Step 2: Keep Only the Original Images ---
+    # The augmented images are derived from the originals, so mixing them into
+    # the split would leak test images into training. `origin` is a Categorical
+    # built at load time, so this is a single compare on its integer codes.
+    original_df = df[df['origin'].cat.codes == 0]
+    print(f"Using {len(original_df)} original images for the split.")
+
+    # --- Step 3: Split into Train, Validation, and Test Sets ---
+    # We stratify by label so every split keeps the same class balance. Both
+    # splits work on index arrays, so each DataFrame is sliced exactly once.
+    labels = original_df['label'].to_numpy()
+    test_splitter = StratifiedShuffleSplit(n_splits=1, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+    train_val_idx, test_idx = next(test_splitter.split(np.zeros(len(labels)), labels))
+
+    val_splitter = StratifiedShuffleSplit(
+        n_splits=1, test_size=VAL_SIZE / (1 - TEST_SIZE), random_state=RANDOM_STATE
+    )
+    train_sub, val_sub = next(val_splitter.split(np.zeros(len(train_val_idx)), labels[train_val_idx]))
+
+    final_train_df = original_df.iloc[train_val_idx[train_sub]]
+    val_df = original_df.iloc[train_val_idx[val_sub]]
+    test_df = original_df.iloc[test_idx]
+    print(f"Split sizes -> train: {len(final_train_df)}, val: {len(val_df)}, test: {len(test_df)}")
+
+    # --- Step 4: Resize and Save Each Split ---
+    train_dir = os.path.join(PROCESSED_DATA_DIR, 'train')
+    val_dir = os.path.join(PROCESSED_DATA_DIR, 'val')
+    test_dir = os.path.join(PROCESSED_DATA_DIR, 'test')
+
+    # The three splits write to separate folders, so they can run side by side.
+    # Each split is also packed into TFRecord shards for fast training input.
+    tfrecord_dir = os.path.join(PROCESSED_DATA_DIR, TFRECORD_DIR_NAME)
+    splits = [(final_train_df, train_dir), (val_df, val_dir), (test_df, test_dir)]
+    with ThreadPoolExecutor(max_workers=len(splits)) as executor:
+        list(executor.map(
+            lambda split: process_dataframe(*split, tfrecord_dir=tfrecord_dir), splits
+        ))
+
+    # Only record the key once every split has been written.
+    with open(SENTINEL_PATH, 'w') as f:
+        f.write(key)
+
+    print(f"--- ✅ Preprocessing Complete. Processed data saved to: {PROCESSED_DATA_DIR} ---")
+
+if __name__ == '__main__':
+    main()
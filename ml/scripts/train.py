@@ -9,7 +9,6 @@ parameters, metrics, and model artifacts to MLflow.
 import os
 import sys
 import argparse
-import numpy as np
 import tensorflow as tf
 # --- 1. IMPORT MLFLOW ---
 import mlflow
@@ -24,7 +23,8 @@ if project_root not in sys.path:
 
 # --- Custom Modules ---
 # Import our model-building functions to create our "recipe book".
-from ml.src.model import build_full_model, create_regularized_transfer_model
+from ml.src.model import build_full_model, cnn_weights_path, create_regularized_transfer_model
+from ml.src.dataset_utils import load_split_dataset, prepare_dataset
 
 # --- Model Registry ---
 # This dictionary maps model names to their creation functions,
@@ -36,11 +36,57 @@ MODEL_REGISTRY = {
 
 # --- Constants ---
 PROCESSED_DATA_DIR = os.path.join(project_root, 'data', 'processed')
+# Written by preprocess.py; its key changes whenever the processed data does.
+SENTINEL_PATH = os.path.join(PROCESSED_DATA_DIR, '.sentinel')
 IMG_HEIGHT = 224
 IMG_WIDTH = 224
 
-def train_model(model_name, model_save_path, epochs, batch_size, learning_rate):
+def configure_tf32(enabled):
+    """Enables or disables TF32 execution and reports whether the GPU supports it."""
+    tf.config.experimental.enable_tensor_float_32_execution(enabled)
+    gpus = tf.config.list_physical_devices('GPU')
+    if not gpus:
+        print("No GPU found; TF32 setting has no effect.")
+        return
+    details = tf.config.experimental.get_device_details(gpus[0])
+    capability = details.get('compute_capability')
+    # TF32 tensor cores were introduced with Ampere (compute capability 8.0).
+    active = enabled and capability is not None and capability >= (8, 0)
+    print(f"GPU: {details.get('device_name', 'unknown')} (compute capability {capability}), "
+          f"TF32 {'active' if active else 'inactive'}.")
+
+def read_preprocessing_key():
+    """Returns the key of the last preprocessing run, or None if it is unknown."""
+    if not os.path.exists(SENTINEL_PATH):
+        return None
+    with open(SENTINEL_PATH) as f:
+        return f.read().strip() or None
+
+def train_model(model_name, model_save_path, epochs, batch_size, learning_rate, cache_dir=None,
+                precision='mixed_bfloat16', tf32=True, xla=True, steps_per_execution=32):
     """Main function to run the model training pipeline with MLflow tracking."""
+
+    # --- TF32 Tensor Cores ---
+    # On Ampere and newer GPUs, float32 matmuls and convolutions can run on
+    # tensor cores in TF32. On older GPUs and on CPU this setting has no effect.
+    configure_tf32(tf32)
+
+    # All our models use NHWC ('channels_last'), the tensor-core friendly layout.
+    tf.keras.backend.set_image_data_format('channels_last')
+
+    # --- XLA ---
+    # Besides compiling the train step (see `model.compile` below), let XLA
+    # auto-cluster any remaining graph ops. XLA handles bfloat16 and TF32
+    # natively, so this composes with the precision settings above. To inspect
+    # the fused clusters, run with XLA_FLAGS=--xla_dump_to=/tmp/xla_dump.
+    tf.config.optimizer.set_jit('autoclustering' if xla else False)
+
+    # --- Mixed Precision ---
+    # Conv and Dense layers compute in half precision while the weights stay in
+    # float32, roughly halving memory traffic on GPUs with tensor cores.
+    # bfloat16 keeps float32's exponent range, so it needs no loss scaling.
+    # This must be set before any model is built.
+    tf.keras.mixed_precision.set_global_policy(precision)
     
     # --- THIS IS THE NEW LINE ---
     # Set a descriptive name for the experiment based on the model being trained.
@@ -56,51 +102,71 @@ def train_model(model_name, model_save_path, epochs, batch_size, learning_rate):
 
     # --- Data Loading and Preparation ---
     print("Loading datasets...")
-    train_dataset = tf.keras.utils.image_dataset_from_directory(
-        os.path.join(PROCESSED_DATA_DIR, 'train'),
-        image_size=(IMG_HEIGHT, IMG_WIDTH),
-        batch_size=batch_size,
-        label_mode='binary'
-    )
-    val_dataset = tf.keras.utils.image_dataset_from_directory(
-        os.path.join(PROCESSED_DATA_DIR, 'val'),
-        image_size=(IMG_HEIGHT, IMG_WIDTH),
-        batch_size=batch_size,
-        label_mode='binary'
-    )
-
-    # Flip labels so that Cancer = 1, making it our positive class.
-    train_dataset = train_dataset.map(lambda x, y: (x, 1 - y))
-    val_dataset = val_dataset.map(lambda x, y: (x, 1 - y))
-
-    # Apply model-specific preprocessing (only for transfer learning models).
-    if model_name != 'baseline':
-        preprocess_input = tf.keras.applications.efficientnet.preprocess_input
-        train_dataset = train_dataset.map(lambda x, y: (preprocess_input(x), y))
-        val_dataset = val_dataset.map(lambda x, y: (preprocess_input(x), y))
-    print("✅ Datasets configured.")
+    train_dataset = load_split_dataset(PROCESSED_DATA_DIR, 'train', (IMG_HEIGHT, IMG_WIDTH), shuffle=True)
+    val_dataset = load_split_dataset(PROCESSED_DATA_DIR, 'val', (IMG_HEIGHT, IMG_WIDTH), shuffle=False)
 
     # --- Class Weights ---
-    # Calculate weights to handle the imbalanced dataset.
-    remapped_labels = np.concatenate([y for x, y in train_dataset], axis=0)
-    non_cancer_count, cancer_count = np.bincount(remapped_labels.astype(int).flatten())
+    # Calculate weights to handle the imbalanced dataset (Cancer = 1).
+    # Labels come from the class folders, so counting directory entries is
+    # enough; no image is read or decoded here.
+    train_dir = os.path.join(PROCESSED_DATA_DIR, 'train')
+    non_cancer_count = len(os.listdir(os.path.join(train_dir, 'Non-Cancer')))
+    cancer_count = len(os.listdir(os.path.join(train_dir, 'Cancer')))
     total = non_cancer_count + cancer_count
     weight_for_0 = (1 / non_cancer_count) * (total / 2.0)
     weight_for_1 = (1 / cancer_count) * (total / 2.0)
-    class_weights = {0: weight_for_0, 1: weight_for_1}
+    class_weights = [weight_for_0, weight_for_1]
     print(f"Calculated class weights: {class_weights}")
 
+    # Flip labels so that Cancer = 1, making it our positive class, and apply
+    # model-specific preprocessing (only for transfer learning models).
+    preprocess_input = None
+    if model_name != 'baseline':
+        preprocess_input = tf.keras.applications.efficientnet.preprocess_input
+    # Decoded samples are cached after the first epoch: in memory by default,
+    # or on disk when a cache directory is given. On-disk caches outlive this
+    # run, so their names include the preprocessing key; after preprocess.py
+    # rewrites the data (and with it the class weights), a fresh cache is built.
+    train_cache, val_cache = True, True
+    if cache_dir:
+        preprocessing_key = read_preprocessing_key()
+        if preprocessing_key is None:
+            print(f"⚠️ No preprocessing key found at {SENTINEL_PATH}; caching in memory instead of {cache_dir}.")
+        else:
+            os.makedirs(cache_dir, exist_ok=True)
+            cache_prefix = os.path.join(cache_dir, f"{model_name}_{preprocessing_key[:16]}")
+            train_cache = f"{cache_prefix}_train"
+            val_cache = f"{cache_prefix}_val"
+    # Only the baseline model trains with data augmentation, and never on the
+    # validation set. The class weights travel with each training batch as
+    # per-sample weights, instead of being looked up by `fit` every step.
+    train_dataset = prepare_dataset(
+        train_dataset, batch_size, preprocess_input, cache=train_cache, shuffle=True, augment=model_name == 'baseline',
+        class_weights=class_weights
+    )
+    val_dataset = prepare_dataset(val_dataset, batch_size, preprocess_input, cache=val_cache)
+    print("✅ Datasets configured.")
+
     # --- Model Creation ---
     # Look up the correct model-building function from our registry.
     model_creation_function = MODEL_REGISTRY.get(model_name)
     model = model_creation_function(input_shape=(IMG_HEIGHT, IMG_WIDTH, 3))
 
     # Compile the model with its optimizer, loss, and metrics.
-    model.compile(
-        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+    optimizer = tf.keras.optimizers.Adam(learning_rate=learning_rate)
+    if precision == 'mixed_float16':
+        # float16 has a narrow range, so scale the loss to keep small gradients from underflowing.
+        optimizer = tf.keras.mixed_precision.LossScaleOptimizer(optimizer)
+    compile_kwargs = dict(
+        optimizer=optimizer,
         loss=tf.keras.losses.BinaryCrossentropy(),
-        metrics=['accuracy', tf.keras.metrics.Recall(name='recall')]
+        metrics=['accuracy', tf.keras.metrics.Recall(name='recall')],
+        # Run several training steps per call into the compiled function, so
+        # Python dispatch overhead doesn't dominate small, fast steps.
+        steps_per_execution=steps_per_execution
     )
+    # XLA fuses each Conv with its bias and activation into a single kernel.
+    model.compile(**compile_kwargs, jit_compile=xla)
     
     # --- 3. RUN TRAINING INSIDE AN MLFLOW CONTEXT ---
     # By wrapping our training in `mlflow.start_run()`, we ensure everything
@@ -108,20 +174,49 @@ def train_model(model_name, model_save_path, epochs, batch_size, learning_rate):
     with mlflow.start_run():
         print("\n--- Starting model training ---")
         # MLflow autolog will automatically capture the history object.
-        model.fit(
-            train_dataset,
+        best_weights_path = os.path.splitext(model_save_path)[0] + '.best.weights.h5'
+        fit_kwargs = dict(
             validation_data=val_dataset,
             epochs=epochs,
-            class_weight=class_weights,
-            # Use early stopping to find the best model and prevent overfitting.
-            callbacks=[tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)]
+            callbacks=[
+                # Use early stopping to find the best model and prevent overfitting.
+                tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True),
+                # Keep the weights of the epoch with the best Cancer recall. Saving
+                # weights only is much faster than writing the full model each time.
+                tf.keras.callbacks.ModelCheckpoint(
+                    filepath=best_weights_path,
+                    save_weights_only=True,
+                    save_best_only=True,
+                    monitor='val_recall',
+                    mode='max'
+                ),
+            ],
         )
+        try:
+            model.fit(train_dataset, **fit_kwargs)
+        except (tf.errors.InvalidArgumentError, tf.errors.UnimplementedError) as e:
+            # Some ops can't always be compiled by XLA; that fails on the
+            # first step, so retry without it. The same errors raised after
+            # training has started (e.g. a corrupt image) are real failures.
+            if not xla or model.optimizer.iterations.numpy() > 0:
+                raise
+            print(f"⚠️ XLA compilation failed ({type(e).__name__}); retrying without jit_compile.")
+            model.compile(**compile_kwargs, jit_compile=False)
+            model.fit(train_dataset, **fit_kwargs)
         print("--- Model training finished ---\n")
 
         # Autolog saves the best model automatically as an artifact,
         # but we also save it to our local checkpoints folder for consistency.
         model.save(model_save_path)
         print(f"✅ Model saved successfully to: {model_save_path}")
+        print(f"✅ Best-recall weights saved to: {best_weights_path}")
+
+        # Also save the CNN's weights on their own, so the ONNX export can
+        # load them directly into a clean inference model.
+        if model_name == 'baseline':
+            weights_path = cnn_weights_path(model_save_path)
+            model.save_weights(weights_path)
+            print(f"✅ CNN weights saved successfully to: {weights_path}")
 
 if __name__ == '__main__':
     # --- Command-Line Argument Parser ---
@@ -131,6 +226,19 @@ if __name__ == '__main__':
     parser.add_argument("--epochs", type=int, default=50) # Higher default since we use early stopping
     parser.add_argument("--batch-size", type=int, default=32)
     parser.add_argument("--learning-rate", type=float, default=1e-5)
+    parser.add_argument("--cache-dir", type=str, default=None,
+                        help="Cache decoded datasets on disk here instead of in memory.")
+    parser.add_argument("--precision", type=str, default="mixed_bfloat16",
+                        choices=["float32", "mixed_float16", "mixed_bfloat16"],
+                        help="Keras dtype policy used for training.")
+    parser.add_argument("--no-tf32", action="store_true",
+                        help="Disable TF32 tensor-core math for bit-exact float32 results.")
+    parser.add_argument("--no-xla", action="store_true",
+                        help="Disable XLA compilation of the training step.")
+    parser.add_argument("--steps-per-execution", type=int, default=32,
+                        help="Number of training steps run per compiled function call.")
     
     args = parser.parse_args()
-    train_model(args.model_name, args.model_save_path, args.epochs, args.batch_size, args.learning_rate)
\ No newline at end of file
+    train_model(args.model_name, args.model_save_path, args.epochs, args.batch_size, args.learning_rate,
+                cache_dir=args.cache_dir, precision=args.precision, tf32=not args.no_tf32,
+                xla=not args.no_xla, steps_per_execution=args.steps_per_execution)
\ No newline at end of file
@@ -1,24 +1,71 @@
 import os
 import pandas as pd
 
+IMG_EXTS = ('.png', '.jpg', '.jpeg')
+LABEL_CATEGORIES = ['Cancer', 'Non-Cancer']
+ORIGIN_CATEGORIES = ['original', 'augmented']
+# The top-level folders of the raw data and the origin of their images.
+DATASET_ORIGINS = {'Original Dataset': 'original', 'Augmented Dataset': 'augmented'}
+
+# Arrow-backed strings keep all file paths in one contiguous buffer and give
+# vectorized `.str` methods; plain pandas strings are the fallback.
+try:
+    import pyarrow  # noqa: F401
+    FILEPATH_DTYPE = 'string[pyarrow]'
+except ImportError:
+    FILEPATH_DTYPE = 'string'
+
+def _iter_image_files(root, origin):
+    """
+    Recursively yields (filepath, label, origin) rows for every image below `root`.
+
+    `os.scandir` reuses the directory entry type information, so no extra
+    stat call is needed per file. The label is the name of the directory
+    being scanned, computed once per directory rather than once per file.
+    """
+    label = os.path.basename(root)
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_image_files(entry.path, origin)
+            elif entry.name.lower().endswith(IMG_EXTS):
+                yield entry.path, label, origin
+
 def load_image_paths(data_path):
     """
     Scans the data directory and returns a DataFrame with image paths and labels.
+
+    The `origin` column records whether each image came from the original or
+    the augmented dataset, based on the top-level folder it was found in.
+    Only the 'Augmented Dataset' folder counts as augmented; images anywhere
+    else, including in `data_path` itself (e.g. a single class folder), are
+    original. Every image must sit in a folder named after its label.
     """
-    filepaths = []
-    labels = []
-    
-    # Get all subdirectories (e.g., Original/Cancer, Augmented/Non-Cancer)
-    for dirpath, _, filenames in os.walk(data_path):
-        for filename in filenames:
-            if filename.endswith(('.png', '.jpg', '.jpeg')):
-                filepath = os.path.join(dirpath, filename)
-                filepaths.append(filepath)
-                
-                # Extract the label (e.g., 'Cancer', 'Non-Cancer') from the folder name
-                label = os.path.basename(os.path.dirname(filepath))
-                labels.append(label)
-                
-    # Create a DataFrame
-    df = pd.DataFrame({'filepath': filepaths, 'label': labels})
-    return df
\ No newline at end of file
+    label = os.path.basename(os.path.normpath(data_path))
+    rows = []
+    # Each top-level folder (e.g., 'Original Dataset', 'Augmented Dataset')
+    # is walked separately so its origin is known without parsing every path.
+    with os.scandir(data_path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                rows.extend(_iter_image_files(entry.path, DATASET_ORIGINS.get(entry.name, 'original')))
+            elif entry.name.lower().endswith(IMG_EXTS):
+                rows.append((entry.path, label, 'original'))
+    filepaths, labels, origins = zip(*rows) if rows else ((), (), ())
+
+    # Labels come from folder names. Anything outside LABEL_CATEGORIES would
+    # silently become NaN in the categorical column, so reject it up front.
+    unknown_labels = set(labels) - set(LABEL_CATEGORIES)
+    if unknown_labels:
+        raise ValueError(
+            f"Found images in folders that are not a known label {LABEL_CATEGORIES}: {sorted(unknown_labels)}"
+        )
+
+    # Create the DataFrame in a single step, storing each column in a compact,
+    # typed form: labels and origins as int8-coded categoricals.
+    df = pd.DataFrame({
+        'filepath': pd.array(filepaths, dtype=FILEPATH_DTYPE),
+        'label': pd.Categorical(labels, categories=LABEL_CATEGORIES),
+        'origin': pd.Categorical(origins, categories=ORIGIN_CATEGORIES),
+    }, copy=False)
+    return df
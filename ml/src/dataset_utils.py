@@ -0,0 +1,228 @@
+"""
+This script contains the tf.data helpers shared by our training and
+evaluation scripts, so that every model is fed its data the same way.
+"""
+
+import os
+from glob import glob
+import numpy as np
+import tensorflow as tf
+
+from ml.src.data_utils import load_image_paths
+
+# Class folders in alphabetical order. These are the label indices that
+# `image_dataset_from_directory` assigns, and the ones stored in our TFRecords,
+# so both sources go through the same Cancer = 1 remap below.
+DIRECTORY_CLASS_NAMES = ['Cancer', 'Non-Cancer']
+TFRECORD_DIR_NAME = 'tfrecords'
+SHARD_SIZE_BYTES = 128 * 1024 * 1024
+
+_FEATURE_SPEC = {
+    'image': tf.io.FixedLenFeature([], tf.string),
+    'label': tf.io.FixedLenFeature([], tf.int64),
+}
+
+def serialize_example(image_bytes, label):
+    """Serializes one encoded image and its class folder name into a tf.train.Example."""
+    feature = {
+        'image': tf.train.Feature(bytes_list=tf.train.BytesList(value=[image_bytes])),
+        'label': tf.train.Feature(int64_list=tf.train.Int64List(value=[DIRECTORY_CLASS_NAMES.index(label)])),
+    }
+    return tf.train.Example(features=tf.train.Features(feature=feature)).SerializeToString()
+
+def write_tfrecord_shards(records, tfrecord_dir, split):
+    """
+    Writes serialized examples for one split into ~128MB TFRecord shards
+    named `<split>-00000-of-0000N.tfrecord`, replacing any previous shards.
+    """
+    os.makedirs(tfrecord_dir, exist_ok=True)
+    for old_shard in glob(os.path.join(tfrecord_dir, f"{split}-*.tfrecord")):
+        os.remove(old_shard)
+
+    # Group records into shards of roughly SHARD_SIZE_BYTES each.
+    shards, current, current_size = [], [], 0
+    for record in records:
+        if current and current_size + len(record) > SHARD_SIZE_BYTES:
+            shards.append(current)
+            current, current_size = [], 0
+        current.append(record)
+        current_size += len(record)
+    if current:
+        shards.append(current)
+
+    for i, shard in enumerate(shards):
+        shard_path = os.path.join(tfrecord_dir, f"{split}-{i:05d}-of-{len(shards):05d}.tfrecord")
+        with tf.io.TFRecordWriter(shard_path) as writer:
+            for record in shard:
+                writer.write(record)
+
+def _decode_and_resize(image_bytes, image_size):
+    """
+    Decodes an encoded image into a uint8 (height, width, 3) tensor.
+
+    JPEGs use the fast integer IDCT without fancy upsampling, which is roughly
+    twice as fast to decode; other formats (e.g. PNG) use the generic decoder.
+    Pixels stay uint8 (a quarter of the float32 size) through the cache and
+    the host-to-device copy; the models cast and rescale them themselves.
+    """
+    image = tf.cond(
+        tf.io.is_jpeg(image_bytes),
+        lambda: tf.io.decode_jpeg(image_bytes, channels=3, dct_method='INTEGER_FAST', fancy_upscaling=False),
+        lambda: tf.io.decode_image(image_bytes, channels=3, expand_animations=False)
+    )
+    image = tf.saturate_cast(tf.round(tf.image.resize(image, image_size)), tf.uint8)
+    image.set_shape((*image_size, 3))
+    return image
+
+def _parse_example(record, image_size):
+    """Decodes one TFRecord example into a uint8 image and a (1,) float label."""
+    example = tf.io.parse_single_example(record, _FEATURE_SPEC)
+    image = _decode_and_resize(example['image'], image_size)
+    label = tf.cast(tf.reshape(example['label'], [1]), tf.float32)
+    return image, label
+
+def _load_image_folder_dataset(split_dir, image_size, shuffle):
+    """
+    Builds an unbatched (image, label) dataset straight from a split's class
+    folders, decoding and resizing every file inside a parallel tf.data map.
+    """
+    df = load_image_paths(split_dir)
+    filepaths = df['filepath'].to_numpy(dtype=str)
+    # Label indices follow DIRECTORY_CLASS_NAMES (Cancer = 0, Non-Cancer = 1).
+    labels = (df['label'] == DIRECTORY_CLASS_NAMES[1]).to_numpy(dtype=np.float32).reshape(-1, 1)
+
+    dataset = tf.data.Dataset.from_tensor_slices((filepaths, labels))
+    if shuffle:
+        dataset = dataset.shuffle(len(filepaths))
+    return dataset.map(
+        lambda path, label: (_decode_and_resize(tf.io.read_file(path), image_size), label),
+        num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=not shuffle
+    )
+
+def load_split_dataset(processed_dir, split, image_size, shuffle=False):
+    """
+    Loads an unbatched (image, label) dataset for one split of the processed data.
+
+    The split's TFRecord shards are read in parallel when they exist, which
+    avoids opening every image file each epoch. Otherwise we fall back to
+    reading the image folders directly. Labels follow the folder indices
+    (Cancer = 0), like `image_dataset_from_directory` with `label_mode='binary'`.
+    Batching is left to `prepare_dataset`, so samples can be cached and
+    reshuffled on their own rather than as fixed batches.
+    """
+    shard_pattern = os.path.join(processed_dir, TFRECORD_DIR_NAME, f"{split}-*.tfrecord")
+    if not glob(shard_pattern):
+        return _load_image_folder_dataset(os.path.join(processed_dir, split), image_size, shuffle)
+
+    files = tf.data.Dataset.list_files(shard_pattern, shuffle=shuffle)
+    dataset = files.interleave(
+        tf.data.TFRecordDataset,
+        cycle_length=tf.data.AUTOTUNE,
+        num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=not shuffle
+    )
+    if shuffle:
+        dataset = dataset.shuffle(1024)
+    return dataset.map(
+        lambda record: _parse_example(record, image_size),
+        num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=not shuffle
+    )
+
+def _dataset_options(deterministic):
+    """
+    Returns tf.data options that let Grappler fuse adjacent map/batch stages
+    and read files in parallel on a dedicated thread pool. Unless order is
+    required, elements are produced as soon as they are ready so a slow
+    file doesn't stall the whole pipeline.
+    """
+    options = tf.data.Options()
+    options.deterministic = deterministic
+    options.experimental_optimization.map_fusion = True
+    options.experimental_optimization.map_and_batch_fusion = True
+    options.experimental_optimization.map_parallelization = True
+    options.experimental_optimization.parallel_batch = True
+    options.threading.private_threadpool_size = os.cpu_count() or 1
+    return options
+
+def build_augmentation():
+    """
+    Builds the on-the-fly data augmentation applied to training batches.
+
+    These layers randomly alter the training images as they are fed to the
+    model, which forces it to learn the true underlying patterns of the data
+    rather than memorize the samples. They always compute in float32, so a
+    mixed-precision policy never changes the images the pipeline emits.
+    """
+    return tf.keras.Sequential(
+        [
+            # Randomly flip the image horizontally.
+            tf.keras.layers.RandomFlip("horizontal", dtype='float32'),
+            # Randomly rotate the image by a small amount (up to 10% of a full circle).
+            tf.keras.layers.RandomRotation(0.1, dtype='float32'),
+            # Randomly zoom in or out on the image by up to 10%.
+            tf.keras.layers.RandomZoom(0.1, dtype='float32'),
+        ],
+        name="data_augmentation",
+    )
+
+def prepare_dataset(dataset, batch_size, preprocess_fn=None, deterministic=False, cache=None, shuffle=False,
+                    augment=False, class_weights=None):
+    """
+    Remaps labels so that Cancer = 1, applies model-specific preprocessing,
+    and batches the samples.
+
+    The first two steps run in a single parallel map, and batches are
+    prefetched so the input pipeline overlaps with the model's training or
+    inference step. When caching is enabled, decoded and preprocessed samples
+    are stored after the first epoch, so later epochs skip file reads and
+    decoding. Samples are shuffled after the cache and only then batched, so
+    every epoch mixes them into new batches. Augmentation runs on the
+    batches, so every epoch sees new random variations, on CPU threads
+    alongside the accelerator's training step.
+
+    Args:
+        dataset (tf.data.Dataset): An unbatched (image, label) dataset.
+        batch_size (int): Number of samples per batch.
+        preprocess_fn (callable): Optional model-specific input preprocessing.
+        deterministic (bool): Whether the output order must match the input order.
+        cache (bool or str): True to cache in memory, or a file prefix to cache on disk.
+        shuffle (bool): Reshuffle the cached samples every epoch (for training).
+        augment (bool): Apply random data augmentation (training data only).
+        class_weights (list): Optional [Non-Cancer, Cancer] loss weights. When
+            given, each batch also carries per-sample weights, which Keras uses
+            as `sample_weight`.
+
+    Returns:
+        tf.data.Dataset: The prepared dataset.
+    """
+    weights = None if class_weights is None else tf.constant(class_weights, dtype=tf.float32)
+
+    def _prep(x, y):
+        if preprocess_fn is not None:
+            x = preprocess_fn(x)
+        y = 1.0 - y
+        if weights is None:
+            return x, y
+        # Look up the sample's weight from its (1,) label.
+        return x, y, tf.gather(weights, tf.cast(tf.squeeze(y, -1), tf.int32))
+
+    dataset = dataset.map(_prep, num_parallel_calls=tf.data.AUTOTUNE, deterministic=deterministic)
+    if cache:
+        dataset = dataset.cache() if cache is True else dataset.cache(cache)
+        # The cache freezes the first epoch's order, so shuffle the cached
+        # samples to keep each epoch different. Shuffling after the cache (and
+        # batching and prefetching last) keeps the shuffle from defeating the cache.
+        if shuffle:
+            dataset = dataset.shuffle(1024, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size, num_parallel_calls=tf.data.AUTOTUNE, deterministic=deterministic)
+    if augment:
+        augmentation = build_augmentation()
+        dataset = dataset.map(
+            lambda x, *targets: (augmentation(x, training=True), *targets),
+            num_parallel_calls=tf.data.AUTOTUNE,
+            deterministic=deterministic
+        )
+    dataset = dataset.with_options(_dataset_options(deterministic))
+    return dataset.prefetch(tf.data.AUTOTUNE)
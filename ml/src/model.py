@@ -4,9 +4,18 @@ Each function in this file will build and return a Keras model,
 allowing us to keep our model definitions separate, clean, and reusable.
 """
 
+import os
+from functools import lru_cache
 import tensorflow as tf
 from tensorflow.keras import layers, models
 
+# Tensor-core convolution and matmul kernels are only selected when channel
+# counts are multiples of 8; otherwise cuDNN silently falls back to slower
+# kernels. Keep every filter/unit count in the baseline CNN divisible by 8.
+BASELINE_CONV_FILTERS = (32, 64)
+BASELINE_DENSE_UNITS = 128
+assert all(n % 8 == 0 for n in (*BASELINE_CONV_FILTERS, BASELINE_DENSE_UNITS))
+
 def create_baseline_cnn(input_shape=(224, 224, 3)):
     """
     Builds and returns a simple, baseline Convolutional Neural Network (CNN).
@@ -20,60 +29,80 @@ def create_baseline_cnn(input_shape=(224, 224, 3)):
     Returns:
         keras.Model: The compiled Keras model.
     """
-    model = models.Sequential(name="baseline_cnn")
-    model.add(layers.Input(shape=input_shape))
-    model.add(layers.Conv2D(32, (3, 3), activation='relu', padding='same'))
-    model.add(layers.MaxPooling2D((2, 2)))
-    model.add(layers.Conv2D(64, (3, 3), activation='relu', padding='same'))
-    model.add(layers.MaxPooling2D((2, 2)))
-    model.add(layers.Flatten())
-    model.add(layers.Dense(128, activation='relu'))
-    model.add(layers.Dense(1, activation='sigmoid'))
-    return model
+    # The model is built in one pass with the Functional API, which gives a
+    # single static graph for XLA to fuse.
+    inputs = layers.Input(shape=input_shape)
+    # Images arrive as raw 0-255 pixels (uint8 from our input pipeline), so the
+    # cast and scaling to [0, 1] happen on the accelerator as the first layer.
+    x = layers.Rescaling(1. / 255)(inputs)
+    # Layers are pinned to NHWC ('channels_last'), the layout tensor cores prefer.
+    # Each block is Conv -> BatchNorm -> ReLU: the BatchNorm shift replaces the
+    # conv bias, and cuDNN/XLA can fuse the three into a single kernel. (The
+    # ONNX export folds the BatchNorm back into the Conv weights.)
+    for filters in BASELINE_CONV_FILTERS:
+        x = layers.Conv2D(filters, (3, 3), padding='same', use_bias=False,
+                          data_format='channels_last')(x)
+        x = layers.BatchNormalization()(x)
+        x = layers.Activation('relu')(x)
+        x = layers.MaxPooling2D((2, 2), data_format='channels_last')(x)
+    # Averaging each feature map keeps the head at 64x128 weights, instead of
+    # flattening a 56x56x64 map into a ~25.7M-parameter Dense layer.
+    x = layers.GlobalAveragePooling2D(data_format='channels_last')(x)
+    x = layers.Dense(BASELINE_DENSE_UNITS, activation='relu')(x)
+    # The sigmoid runs in float32 so the loss is numerically stable under a
+    # mixed-precision policy, while the Dense matmul still uses the fast dtype.
+    x = layers.Dense(1)(x)
+    outputs = layers.Activation('sigmoid', dtype='float32')(x)
+    return models.Model(inputs, outputs, name="baseline_cnn")
 
 def build_full_model(input_shape=(224, 224, 3)):
     """
-    Builds the complete model by attaching on-the-fly data augmentation
-    layers to the front of our baseline CNN. This is the professional
-    solution to combat overfitting when working with smaller datasets.
+    Builds the complete baseline model used for training.
+
+    On-the-fly data augmentation used to be the first part of this model.
+    It now runs in the tf.data input pipeline (see `prepare_dataset` in
+    `dataset_utils.py`), on the CPU and overlapped with the training step,
+    so the full model is simply our baseline CNN.
 
     Args:
         input_shape (tuple): The shape of the input images (height, width, channels).
 
     Returns:
-        keras.Model: The final, complete Keras model with augmentation.
+        keras.Model: The final, complete Keras model.
     """
-    # --- The "Kaleidoscope": On-the-fly Data Augmentation ---
-    # These layers will randomly alter the training images as they are fed to the model.
-    # This creates a virtually infinite training set and forces the model
-    # to learn the true underlying patterns of the data, not just memorize the samples.
-    data_augmentation = models.Sequential(
-        [
-            # Randomly flip the image horizontally.
-            layers.RandomFlip("horizontal", input_shape=input_shape),
-            # Randomly rotate the image by a small amount (up to 10% of a full circle).
-            layers.RandomRotation(0.1),
-            # Randomly zoom in or out on the image by up to 10%.
-            layers.RandomZoom(0.1),
-        ],
-        name="data_augmentation",
-    )
+    return create_baseline_cnn(input_shape)
 
-    # Get our baseline CNN "engine".
-    baseline_model = create_baseline_cnn(input_shape)
 
-    # --- Chain Everything Together ---
-    # We build the final model by connecting the pieces in order:
-    # Input -> Augmentation Layers -> Baseline CNN -> Output
-    full_model = models.Sequential([
-        data_augmentation,
-        baseline_model
-    ])
-    
-    return full_model
+def cnn_weights_path(model_path):
+    """
+    Returns the path of the weights-only file holding the trained baseline CNN
+    that accompanies a full model checkpoint (e.g. `model.keras` ->
+    `model.cnn.weights.h5`). Inference code can load it straight into a
+    clean CNN without deserializing the full checkpoint.
+    """
+    return os.path.splitext(model_path)[0] + '.cnn.weights.h5'
+
+
+def _load_efficientnet_base(input_shape=(224, 224, 3)):
+    """Builds a new pre-trained EfficientNetB0 base (without its head) for an input shape."""
+    return tf.keras.applications.EfficientNetB0(
+        include_top=False,
+        weights='imagenet',
+        input_shape=input_shape
+    )
 
+@lru_cache(maxsize=2)
+def _get_efficientnet_base(input_shape=(224, 224, 3)):
+    """
+    Returns the shared pre-trained EfficientNetB0 base for an input shape.
+
+    Building the base and loading its ImageNet weights is expensive, so the
+    instance is cached and shared. Callers that change its weights or
+    `trainable` flags independently should build their own base instead.
+    """
+    return _load_efficientnet_base(input_shape)
 
-def create_transfer_model(input_shape=(224, 224, 3), num_classes=1):
+def create_transfer_model(input_shape=(224, 224, 3), num_classes=1, base_model=None):
     """
     Builds a transfer learning model using the pre-trained EfficientNetB0 base.
 
@@ -86,19 +115,18 @@ def create_transfer_model(input_shape=(224, 224, 3), num_classes=1):
     Args:
         input_shape (tuple): The shape of the input images.
         num_classes (int): The number of output classes (1 for binary classification).
+        base_model (keras.Model): An optional pre-loaded EfficientNetB0 base to
+            build on. It is frozen and shared with the returned model.
 
     Returns:
         keras.Model: The complete transfer learning model.
     """
     # --- Step 1: Load the Pre-Trained "Brain" ---
-    # We load EfficientNetB0, pre-trained on the massive ImageNet dataset.
-    # `include_top=False` means we chop off the original head.
-    # `weights='imagenet'` specifies which pre-trained weights to use.
-    base_model = tf.keras.applications.EfficientNetB0(
-        include_top=False,
-        weights='imagenet',
-        input_shape=input_shape
-    )
+    # We load EfficientNetB0, pre-trained on the massive ImageNet dataset,
+    # with its original head chopped off. The instance is cached, so building
+    # several models on this backbone only loads the weights once.
+    if base_model is None:
+        base_model = _get_efficientnet_base(tuple(input_shape))
 
     # --- Step 2: Freeze the "Brain" ---
     # We lock the pre-trained weights so they don't change during our
@@ -112,29 +140,38 @@ def create_transfer_model(input_shape=(224, 224, 3), num_classes=1):
     global_average_layer = tf.keras.layers.GlobalAveragePooling2D()
     
     # We add a final Dense layer with a sigmoid activation for our binary decision.
-    prediction_layer = tf.keras.layers.Dense(num_classes, activation='sigmoid')
+    # The sigmoid runs in float32 for a numerically stable loss under mixed precision.
+    prediction_layer = tf.keras.layers.Dense(num_classes)
+    output_activation = tf.keras.layers.Activation('sigmoid', dtype='float32')
 
     # --- Step 4: Chain Everything Together ---
     # We use the Keras Functional API to build the final model.
     inputs = tf.keras.Input(shape=input_shape)
     x = base_model(inputs, training=False) # `training=False` is important for frozen layers
     x = global_average_layer(x)
-    outputs = prediction_layer(x)
+    x = prediction_layer(x)
+    outputs = output_activation(x)
     
     model = tf.keras.Model(inputs, outputs)
 
     return model
 
-def create_regularized_transfer_model(input_shape=(224, 224, 3), num_classes=1):
+def create_regularized_transfer_model(input_shape=(224, 224, 3), num_classes=1, base_model=None):
     """
     Builds a transfer learning model with a Dropout layer for regularization.
+
+    An optional pre-loaded EfficientNetB0 `base_model` can be passed in; it is
+    copied, never modified.
     """
-    # Load a fresh pre-trained EfficientNetB0 base model.
-    base_model = tf.keras.applications.EfficientNetB0(
-        include_top=False,
-        weights='imagenet',
-        input_shape=input_shape
-    )
+    # Fine-tuning changes the base's weights and trainable flags, so this model
+    # needs a base of its own. Without one given, we build it fresh (rather
+    # than copying the cached base), so only one copy is ever held in memory.
+    if base_model is None:
+        base_model = _load_efficientnet_base(tuple(input_shape))
+    else:
+        source_base = base_model
+        base_model = tf.keras.models.clone_model(source_base)
+        base_model.set_weights(source_base.get_weights())
     # The base is trainable, allowing for fine-tuning.
     base_model.trainable = True
 
@@ -150,15 +187,18 @@ def create_regularized_transfer_model(input_shape=(224, 224, 3), num_classes=1):
     # This makes the model more robust and less likely to overfit.
     dropout_layer = tf.keras.layers.Dropout(0.5) 
     
-    # Final decision-making layer.
-    prediction_layer = tf.keras.layers.Dense(num_classes, activation='sigmoid')
+    # Final decision-making layer, with the sigmoid in float32 for a stable loss
+    # under mixed precision.
+    prediction_layer = tf.keras.layers.Dense(num_classes)
+    output_activation = tf.keras.layers.Activation('sigmoid', dtype='float32')
 
     # Chain all the components together using the Keras Functional API.
     inputs = tf.keras.Input(shape=input_shape)
     x = base_model(inputs, training=False)
     x = global_average_layer(x)
     x = dropout_layer(x) # Apply dropout before the final prediction.
-    outputs = prediction_layer(x)
+    x = prediction_layer(x)
+    outputs = output_activation(x)
     
     model = tf.keras.Model(inputs, outputs)
     return model
@@ -170,10 +210,13 @@ if __name__ == '__main__':
     baseline_model = create_baseline_cnn()
     baseline_model.summary()
 
+    # Load the EfficientNetB0 base once and build both transfer heads on it.
+    efficientnet_base = _get_efficientnet_base()
+
     print("\n\n--- Creating and summarizing the transfer learning model ---")
-    transfer_model = create_transfer_model()
+    transfer_model = create_transfer_model(base_model=efficientnet_base)
     transfer_model.summary()
     
     print("\n\n--- Creating and summarizing the regularized transfer learning model ---")
-    regularized_model = create_regularized_transfer_model()
+    regularized_model = create_regularized_transfer_model(base_model=efficientnet_base)
     regularized_model.summary()
\ No newline at end of file
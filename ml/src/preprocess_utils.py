@@ -1,44 +1,134 @@
 import cv2
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm # For a nice progress bar
 
-def process_and_save_image(read_path, save_path, target_size=(224, 224)):
+from ml.src.dataset_utils import serialize_example, write_tfrecord_shards
+
+# Bump this whenever the processing itself changes (e.g. the decoding or
+# interpolation choices below), so preprocess.py rebuilds the processed data.
+PROCESSING_VERSION = 2
+TARGET_SIZE = (224, 224)
+
+# Processed copies are saved as lightly compressed PNGs: lossless, and much
+# cheaper to write than re-encoding a JPEG. The TFRecords that training reads
+# store the same PNG bytes, so every input path sees identical pixels.
+SAVE_EXT = '.png'
+PNG_WRITE_PARAMS = [cv2.IMWRITE_PNG_COMPRESSION, 1]
+
+# Make sure OpenCV uses its SIMD-optimized code paths.
+cv2.setUseOptimized(True)
+
+def process_and_save_image(read_path, save_path, target_size=TARGET_SIZE):
     """
     Reads an image, resizes it to a standard size, and saves it.
     """
     try:
-        img = cv2.imread(read_path)
+        # Our source images are usually far larger than the target size, so we
+        # decode at half resolution (much cheaper for JPEGs) and only fall back
+        # to a full decode when that leaves fewer pixels than we need.
+        img = cv2.imread(read_path, cv2.IMREAD_REDUCED_COLOR_2)
+        if img is not None and (img.shape[1] < target_size[0] or img.shape[0] < target_size[1]):
+            img = cv2.imread(read_path)
         if img is None:
             print(f"Warning: Could not read image {read_path}. Skipping.")
             return
 
-        # Resize the image
-        img_resized = cv2.resize(img, target_size)
-        
-        # Save the processed image
-        cv2.imwrite(save_path, img_resized)
+        # Resize the image, unless it is already the target size. Area
+        # interpolation gives clean, alias-free results when shrinking.
+        height, width = img.shape[:2]
+        if (width, height) == tuple(target_size):
+            img_resized = img
+        else:
+            shrinking = width > target_size[0] or height > target_size[1]
+            interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR
+            img_resized = cv2.resize(img, target_size, interpolation=interpolation)
+
+        # Save the processed image (PNG paths get fast, light compression)
+        params = PNG_WRITE_PARAMS if save_path.lower().endswith('.png') else []
+        cv2.imwrite(save_path, img_resized, params)
+        return img_resized
 
     except Exception as e:
         print(f"Error processing {read_path}: {e}")
 
-def process_dataframe(df, save_dir):
+def _process_one(filepath, save_path, label, serialize=False):
+    """
+    Processes a single image. If `serialize` is set, it is also returned as
+    a serialized TFRecord example; otherwise nothing is returned.
+    The example holds the saved PNG file's bytes, so nothing is encoded twice.
+    """
+    # Process and save the image using our other function
+    img_resized = process_and_save_image(filepath, save_path)
+    if img_resized is None or not serialize:
+        return None
+
+    # Also return the image as a serialized TFRecord example. The file was
+    # just written, so reading it back is served from the page cache.
+    try:
+        with open(save_path, 'rb') as f:
+            return serialize_example(f.read(), label)
+    except OSError as e:
+        print(f"Error reading back {save_path}: {e}")
+        return None
+
+def process_dataframe(df, save_dir, max_workers=None, tfrecord_dir=None):
     """
     Processes all images listed in a DataFrame and saves them into class folders.
+
+    Reading, decoding, and writing images is mostly I/O and OpenCV work that
+    releases the GIL, so rows are processed concurrently on a thread pool.
+    If `tfrecord_dir` is given, the split is also written there as TFRecord
+    shards named after `save_dir` (e.g. `train-00000-of-00001.tfrecord`).
     """
-    # Create the main save directory if it doesn't exist
+    # Start from an empty save directory, so images from an earlier run (or an
+    # older file format) are never mixed into this split.
+    shutil.rmtree(save_dir, ignore_errors=True)
+
+    # Create the main save directory and one subdirectory per label
+    # (e.g., .../train/Cancer) up front, instead of once per image.
     os.makedirs(save_dir, exist_ok=True)
-    
-    # Using tqdm for a nice progress bar
-    for index, row in tqdm(df.iterrows(), total=df.shape[0], desc=f"Processing images for {os.path.basename(save_dir)}"):
-        label = row['label']
-        filepath = row['filepath']
-        
-        # Create a subdirectory for the label (e.g., .../train/Cancer)
-        label_dir = os.path.join(save_dir, label)
+    label_to_dir = {label: os.path.join(save_dir, label) for label in df['label'].unique()}
+    for label_dir in label_to_dir.values():
         os.makedirs(label_dir, exist_ok=True)
-        
-        # Define the full save path for the new image
-        save_path = os.path.join(label_dir, os.path.basename(filepath))
-        
-        # Process and save the image using our other function
-        process_and_save_image(filepath, save_path)
\ No newline at end of file
+
+    # Work out every (read path, save path, label) task in a single pass. The
+    # label folders are already known, so a plain string concatenation is
+    # enough to build each save path.
+    # `itertuples` yields lightweight namedtuples instead of boxing every row
+    # into a pandas Series.
+    tasks = [
+        (
+            row.filepath,
+            label_to_dir[row.label] + os.sep + os.path.splitext(os.path.basename(row.filepath))[0] + SAVE_EXT,
+            row.label,
+        )
+        for row in df.itertuples(index=False)
+    ]
+
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) * 4)
+
+    # We already parallelize across images, so stop OpenCV from starting its
+    # own threads inside every call and oversubscribing the CPU.
+    cv2.setNumThreads(1)
+
+    # Images are only serialized and kept in memory when TFRecords are wanted.
+    serialize = tfrecord_dir is not None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Using tqdm for a nice progress bar, redrawn at most ~200 times and
+        # twice a second so terminal output doesn't slow the workers down.
+        results = tqdm(
+            executor.map(lambda task: _process_one(*task, serialize=serialize), tasks),
+            total=len(tasks),
+            desc=f"Processing images for {os.path.basename(save_dir)}",
+            mininterval=0.5,
+            miniters=max(1, len(tasks) // 200)
+        )
+        # Keep only the serialized records (there are none without TFRecords).
+        records = [record for record in results if record is not None]
+
+    if serialize:
+        write_tfrecord_shards(records, tfrecord_dir, os.path.basename(save_dir))
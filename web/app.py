@@ -8,10 +8,15 @@ Version: 1.0.0
 """
 
 import streamlit as st
-import requests
-from PIL import Image
+import hashlib
+import io
+import json
 import os
-import time
+from concurrent.futures import ThreadPoolExecutor
+
+# PIL and httpx are only needed by the demo page, so they are
+# imported where they are used. Visitors landing on the overview page (e.g. a
+# cold Cloud Run container) don't pay for those imports.
 
 # --- Configuration ---
 st.set_page_config(
@@ -21,8 +26,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for better styling
-st.markdown("""
+# Custom CSS for better styling. It is built once at import time; each rerun
+# sends the identical payload, which Streamlit's element diffing can skip.
+_CSS = """
     <style>
     .main-header {
         font-size: 3rem;
@@ -51,7 +57,7 @@ st.markdown("""
         color: white;
         text-align: center;
     }
-    .stButton>button {
+    .stButton>button, .stFormSubmitButton>button {
         width: 100%;
         background: linear-gradient(120deg, #e91e63, #f06292);
         color: white;
@@ -61,7 +67,7 @@ st.markdown("""
         border-radius: 8px;
         transition: transform 0.2s;
     }
-    .stButton>button:hover {
+    .stButton>button:hover, .stFormSubmitButton>button:hover {
         transform: scale(1.02);
         background: linear-gradient(120deg, #c2185b, #e91e63);
     }
@@ -73,12 +79,139 @@ st.markdown("""
         margin: 1rem 0;
     }
     </style>
-""", unsafe_allow_html=True)
+"""
+
+# Must not exceed the backend's limit on images per batch request.
+MAX_BATCH_SIZE = 16
+RESULT_GRID_COLUMNS = 2
+# Separate connect and read timeouts: fail fast if the API is unreachable,
+# but give the model plenty of time to answer.
+API_CONNECT_TIMEOUT = 3.05
+API_READ_TIMEOUT = 60
+# Largest width/height of the on-page preview. The full image is only sent to the API.
+PREVIEW_MAX_SIZE = (512, 512)
+PREVIEW_JPEG_QUALITY = 80
+
+
+def _create_http_client():
+    """
+    Creates the HTTP client for talking to the backend API.
+
+    The client is kept by `bootstrap()`, so its pooled keep-alive connections
+    survive reruns instead of a new TCP/TLS connection being opened for every
+    prediction. Over HTTPS (e.g. on Cloud Run) it negotiates HTTP/2, so
+    concurrent requests share a single connection. Failed connection attempts
+    are retried a couple of times.
+    """
+    import httpx
+
+    transport = httpx.HTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(max_connections=8, max_keepalive_connections=4)
+    )
+    return httpx.Client(
+        transport=transport,
+        timeout=httpx.Timeout(API_READ_TIMEOUT, connect=API_CONNECT_TIMEOUT)
+    )
 
-API_URL = os.getenv("API_URL", "http://localhost:8080/api/v1/predict")
+
+@st.cache_resource
+def bootstrap():
+    """
+    Runs the app's one-time setup and returns the shared objects it creates.
+
+    Streamlit reruns the whole script on every interaction, so everything here
+    (reading the environment, building the HTTP client and the thread pool) is
+    cached and done once per server process, then shared by all sessions.
+    Only the demo page calls it, so the overview page never pays for it.
+
+    Returns:
+        dict: `api_url` and `batch_api_url` for the backend endpoints, the
+            shared HTTP `client`, and an `executor` for running API requests
+            in the background, off Streamlit's script thread.
+    """
+    api_url = os.getenv("API_URL", "http://localhost:8080/api/v1/predict")
+    return {
+        "api_url": api_url,
+        # Several images are sent together to the batch endpoint next to api_url.
+        "batch_api_url": os.getenv("BATCH_API_URL", api_url.rsplit("/", 1)[0] + "/predict_batch"),
+        "client": _create_http_client(),
+        "executor": ThreadPoolExecutor(max_workers=4, thread_name_prefix="mammoscan-api"),
+    }
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def decode_image(file_bytes, name):
+    """
+    Decodes an uploaded image once and reuses it on later reruns.
+
+    Every widget interaction reruns the script, so without caching the same
+    mammogram would be decoded again each time. `cache_resource` hands back
+    the same PIL image without pickling or copying it.
+    """
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(file_bytes))
+    image.load()  # Decode now, so the cached image holds the pixels.
+    return image
+
+
+@st.cache_data(max_entries=MAX_BATCH_SIZE, show_spinner=False)
+def make_preview(file_bytes, name):
+    """
+    Returns a small JPEG copy of an uploaded image for display, built once per upload.
+
+    Streamlit sends every displayed image to the browser, so showing a
+    thumbnail instead of the full-resolution mammogram moves far fewer bytes.
+    Handing over ready-made JPEG bytes also spares Streamlit from PNG-encoding
+    a PIL image on every rerun.
+    """
+    from PIL import Image
+
+    preview = decode_image(file_bytes, name).copy()
+    preview.thumbnail(PREVIEW_MAX_SIZE, Image.Resampling.LANCZOS)
+    # JPEG stores grayscale and RGB images; anything else (e.g. RGBA, 16-bit) is converted.
+    if preview.mode not in ("L", "RGB"):
+        preview = preview.convert("RGB")
+    buffer = io.BytesIO()
+    preview.save(buffer, format="JPEG", quality=PREVIEW_JPEG_QUALITY)
+    return buffer.getvalue()
 
 
 # --- Page 1: Project Overview ---
+KEY_FEATURES = [
+    ("🧠 Advanced AI", "State-of-the-art CNN architecture trained on thousands of mammogram images"),
+    ("⚡ Real-time Analysis", "High-performance Go backend delivers predictions in milliseconds"),
+    ("☁️ Cloud-Ready", "Dockerized and deployed on Google Cloud Run for scalability"),
+]
+
+OBJECTIVES = [
+    ("🎯", "High Recall", "Prioritize sensitivity to minimize false negatives in cancer detection"),
+    ("🚀", "Production Ready", "Full MLOps pipeline from training to deployment"),
+    ("📈", "Continuous Improvement", "Automated retraining and model updates"),
+    ("🔒", "Secure & Compliant", "HIPAA-aware design patterns for medical data")
+]
+
+
+@st.cache_data
+def _feature_cards_html():
+    """Returns the HTML for each key-feature card, built once and reused on every rerun."""
+    return [
+        f'<div class="info-card"><h3>{title}</h3><p>{desc}</p></div>'
+        for title, desc in KEY_FEATURES
+    ]
+
+
+@st.cache_data
+def _objectives_html():
+    """Returns all project objectives as one HTML block, so they render in a single element."""
+    return "".join(
+        f'<div class="feature-box"><h4>{icon} {title}</h4><p>{desc}</p></div>'
+        for icon, title, desc in OBJECTIVES
+    )
+
+
 def show_overview_page():
     """Enhanced landing page with better visuals and information."""
     
@@ -110,31 +243,9 @@ def show_overview_page():
     # Key Features Section
     st.header("🎯 Key Features")
     
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.markdown("""
-        <div class="info-card">
-            <h3>🧠 Advanced AI</h3>
-            <p>State-of-the-art CNN architecture trained on thousands of mammogram images</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown("""
-        <div class="info-card">
-            <h3>⚡ Real-time Analysis</h3>
-            <p>High-performance Go backend delivers predictions in milliseconds</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown("""
-        <div class="info-card">
-            <h3>☁️ Cloud-Ready</h3>
-            <p>Dockerized and deployed on Google Cloud Run for scalability</p>
-        </div>
-        """, unsafe_allow_html=True)
+    for column, card_html in zip(st.columns(len(KEY_FEATURES)), _feature_cards_html()):
+        with column:
+            st.markdown(card_html, unsafe_allow_html=True)
 
     # Technical Stack
     st.header("🛠️ Technical Architecture")
@@ -170,20 +281,7 @@ def show_overview_page():
     # Project Goals
     st.header("📊 Project Objectives")
     
-    objectives = [
-        ("🎯", "High Recall", "Prioritize sensitivity to minimize false negatives in cancer detection"),
-        ("🚀", "Production Ready", "Full MLOps pipeline from training to deployment"),
-        ("📈", "Continuous Improvement", "Automated retraining and model updates"),
-        ("🔒", "Secure & Compliant", "HIPAA-aware design patterns for medical data")
-    ]
-    
-    for icon, title, desc in objectives:
-        st.markdown(f"""
-        <div class="feature-box">
-            <h4>{icon} {title}</h4>
-            <p>{desc}</p>
-        </div>
-        """, unsafe_allow_html=True)
+    st.markdown(_objectives_html(), unsafe_allow_html=True)
 
     # Disclaimer
     st.markdown("---")
@@ -209,19 +307,168 @@ def show_overview_page():
 
 
 # --- Page 2: Enhanced Interactive Demo ---
+# Result cards are static HTML, built once at import time.
+_POSITIVE_CARD = """
+<div style="background-color: #ffebee; padding: 1.5rem; border-radius: 10px; border-left: 5px solid #f44336;">
+    <h3 style="color: #c62828; margin: 0;">⚠️ Positive Detection</h3>
+    <p style="margin: 0.5rem 0 0 0;">Potential cancerous tissue detected</p>
+</div>
+"""
+
+_NEGATIVE_CARD = """
+<div style="background-color: #e8f5e9; padding: 1.5rem; border-radius: 10px; border-left: 5px solid #4caf50;">
+    <h3 style="color: #2e7d32; margin: 0;">✅ Negative Detection</h3>
+    <p style="margin: 0.5rem 0 0 0;">No cancerous tissue detected</p>
+</div>
+"""
+
+
+def show_prediction_result(result, compact=False):
+    """
+    Renders one prediction returned by the API.
+
+    The compact form (result card plus confidence score) is used for each
+    image of a batch, where the results are laid out in a grid.
+    """
+    prediction = result.get("prediction", "Unknown")
+    score = result.get("confidence_score", 0.0)
+    threshold = result.get("model_threshold", 0.5)
+    
+    # Result card
+    st.markdown(_POSITIVE_CARD if prediction == "Cancer" else _NEGATIVE_CARD, unsafe_allow_html=True)
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    if compact:
+        st.metric(
+            "Confidence Score",
+            f"{score:.4f}",
+            delta=f"{(score - threshold):.4f} vs threshold"
+        )
+        return
+    
+    # Metrics display
+    col_a, col_b = st.columns(2)
+    with col_a:
+        st.metric(
+            "Confidence Score",
+            f"{score:.4f}",
+            delta=f"{(score - threshold):.4f} vs threshold"
+        )
+    with col_b:
+        st.metric(
+            "Classification",
+            prediction,
+            delta="High Risk" if prediction == "Cancer" else "Low Risk"
+        )
+    
+    # Additional info
+    with st.expander("📊 Technical Details"):
+        st.write(f"**Model Threshold:** {threshold:.4f}")
+        st.write(f"**Confidence Score:** {score:.4f}")
+        st.write(f"**Classification Logic:** Score > Threshold = Cancer")
+        st.write(f"**Response Time:** ~1-2 seconds")
+
+
+def prediction_key(file_bytes):
+    """Returns a short hash identifying an image by its contents (bytes or a memoryview)."""
+    return hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
+
+
+def request_prediction(ctx, pending, prediction_cache):
+    """
+    Sends the given (uploaded file, key) pairs to the API and stores each
+    prediction in `prediction_cache` under its key. Errors are shown on the page.
+
+    Args:
+        ctx (dict): The shared setup returned by `bootstrap()`.
+        pending (list): (uploaded file, key) pairs still to be predicted.
+        prediction_cache (dict): Predictions by key, kept in session state.
+    """
+    import httpx
+    
+    is_batch = len(pending) > 1
+    # A single status element tracks the request; it is updated only once, when
+    # the request finishes, rather than streaming progress updates.
+    status = st.status(
+        f"🚀 Analyzing {len(pending)} images..." if is_batch else "🚀 Analyzing image...",
+        expanded=False
+    )
+    
+    try:
+        # Prepare the files for the POST request. Uploaded files are
+        # passed as file objects, so their bytes are read straight into
+        # the request body instead of being copied out first.
+        for uploaded_file, _ in pending:
+            uploaded_file.seek(0)
+        if is_batch:
+            # All images go to the batch endpoint in a single multipart
+            # request, so the HTTP round trip is paid only once.
+            url = ctx["batch_api_url"]
+            request_kwargs = {"files": [("images", (f.name, f, f.type)) for f, _ in pending]}
+        else:
+            # A single image is sent as the raw request body, with no
+            # multipart encoding; the file object is streamed in chunks.
+            # The backend tags predictions with the same image hash we use as
+            # our key, so If-None-Match lets it answer an image it has already
+            # scored with "304 Not Modified" instead of running the model again.
+            # The image is still uploaded either way; only the inference is saved.
+            url = ctx["api_url"]
+            uploaded_file, key = pending[0]
+            request_kwargs = {
+                "content": uploaded_file,
+                "headers": {
+                    "Content-Type": uploaded_file.type or "application/octet-stream",
+                    "If-None-Match": f'"{key}"',
+                },
+            }
+        
+        # Send the request to our Go backend API on a background thread.
+        future = ctx["executor"].submit(ctx["client"].post, url, **request_kwargs)
+        response = future.result()
+        
+        # Parse the JSON response (a cache hit carries it in a header instead)
+        if response.status_code == 304:
+            results = [json.loads(response.headers["X-Prediction"])]
+        else:
+            response.raise_for_status()
+            result = response.json()
+            results = result.get("predictions", []) if is_batch else [result]
+        for (_, key), file_result in zip(pending, results):
+            prediction_cache[key] = file_result
+        status.update(label="Analysis complete!", state="complete", expanded=False)
+    
+    except httpx.TimeoutException:
+        status.update(label="Analysis failed", state="error")
+        st.error("⏱️ Request timeout. The server took too long to respond. Please try again.")
+    
+    except httpx.TransportError:
+        status.update(label="Analysis failed", state="error")
+        st.error("🔌 Connection Error: Cannot reach the backend server. Please ensure the API is running.")
+    
+    except httpx.HTTPError as e:
+        status.update(label="Analysis failed", state="error")
+        st.error(f"❌ API Error: {str(e)}")
+    
+    except Exception as e:
+        status.update(label="Analysis failed", state="error")
+        st.error(f"❌ Unexpected error: {str(e)}")
+
+
 def show_demo_page():
     """Enhanced prediction interface with better UX."""
+    ctx = bootstrap()
     
     st.markdown('<h1 class="main-header">Interactive Demo 🔬</h1>', unsafe_allow_html=True)
-    st.markdown("Upload a mammogram image to receive an AI-powered analysis")
+    st.markdown("Upload one or more mammogram images to receive an AI-powered analysis")
     
     # Instructions
     with st.expander("📋 How to Use", expanded=False):
-        st.markdown("""
-        1. **Upload** a mammogram image (JPG, JPEG, or PNG format)
-        2. **Preview** your uploaded image
-        3. **Click** the "Analyze Image" button
-        4. **Review** the AI prediction and confidence score
+        st.markdown(f"""
+        1. **Upload** one or more mammogram images (JPG, JPEG, or PNG format, up to {MAX_BATCH_SIZE} at a time)
+        2. **Preview** your uploaded images
+        3. **Click** the "Analyze" button (your images are uploaded and analyzed in one step)
+        4. **Review** the AI prediction and confidence score for each image
         
         **Sample Images:** If you don't have a mammogram image, you can find sample datasets online 
         or use test images from medical imaging repositories.
@@ -233,131 +480,91 @@ def show_demo_page():
     col1, col2 = st.columns([1, 1])
     
     with col1:
-        st.subheader("📤 Upload Image")
-        uploaded_file = st.file_uploader(
-            "Choose a mammogram image",
-            type=["jpg", "jpeg", "png"],
-            help="Supported formats: JPG, JPEG, PNG"
-        )
+        st.subheader("📤 Upload Images")
+        # The uploader and the Analyze button share a form, so choosing files
+        # and submitting them costs a single script rerun instead of two.
+        with st.form("analyze_form", clear_on_submit=False):
+            uploaded_files = st.file_uploader(
+                "Choose mammogram images",
+                type=["jpg", "jpeg", "png"],
+                accept_multiple_files=True,
+                help=f"Supported formats: JPG, JPEG, PNG. Up to {MAX_BATCH_SIZE} images are analyzed together."
+            )
+            submitted = st.form_submit_button("🚀 Analyze", use_container_width=True)
+        
+        if len(uploaded_files) > MAX_BATCH_SIZE:
+            st.warning(f"⚠️ Only the first {MAX_BATCH_SIZE} images will be analyzed.")
+            uploaded_files = uploaded_files[:MAX_BATCH_SIZE]
         
-        if uploaded_file is not None:
-            image = Image.open(uploaded_file)
-            st.image(image, caption="Uploaded Mammogram", use_column_width=True)
+        if len(uploaded_files) == 1:
+            uploaded_file = uploaded_files[0]
+            file_bytes = uploaded_file.getvalue()
+            image = decode_image(file_bytes, uploaded_file.name)
+            st.image(make_preview(file_bytes, uploaded_file.name), caption="Uploaded Mammogram", use_column_width=True)
             
             # Image info
             st.caption(f"📏 Image size: {image.size[0]} x {image.size[1]} pixels")
-            st.caption(f"📄 File size: {len(uploaded_file.getvalue()) / 1024:.2f} KB")
+            st.caption(f"📄 File size: {uploaded_file.size / 1024:.2f} KB")
+        elif uploaded_files:
+            # Several images are shown as a grid of small previews.
+            st.image(
+                [make_preview(f.getvalue(), f.name) for f in uploaded_files],
+                caption=[f.name for f in uploaded_files],
+                width=150
+            )
+            st.caption(f"📄 {len(uploaded_files)} images, {sum(f.size for f in uploaded_files) / 1024:.2f} KB in total")
     
     with col2:
         st.subheader("🔬 Analysis Results")
         
-        if uploaded_file is not None:
-            if st.button("🚀 Analyze Image", use_container_width=True):
-                # Progress bar for better UX
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                try:
-                    status_text.text("Preparing image...")
-                    progress_bar.progress(25)
-                    time.sleep(0.3)
-                    
-                    # Prepare the file for the POST request
-                    files = {"image": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
-                    
-                    status_text.text("Sending to AI model...")
-                    progress_bar.progress(50)
-                    
-                    # Send the request to our Go backend API
-                    response = requests.post(API_URL, files=files, timeout=60)
-                    response.raise_for_status()
-                    
-                    progress_bar.progress(75)
-                    status_text.text("Processing results...")
-                    time.sleep(0.3)
-                    
-                    # Parse the JSON response
-                    result = response.json()
-                    progress_bar.progress(100)
-                    status_text.text("Analysis complete!")
-                    time.sleep(0.5)
-                    
-                    # Clear progress indicators
-                    progress_bar.empty()
-                    status_text.empty()
-                    
-                    # Display results with better formatting
-                    prediction = result.get("prediction", "Unknown")
-                    score = result.get("confidence_score", 0.0)
-                    threshold = result.get("model_threshold", 0.5)
-                    
-                    # Result card
-                    if prediction == "Cancer":
-                        st.markdown("""
-                        <div style="background-color: #ffebee; padding: 1.5rem; border-radius: 10px; border-left: 5px solid #f44336;">
-                            <h3 style="color: #c62828; margin: 0;">⚠️ Positive Detection</h3>
-                            <p style="margin: 0.5rem 0 0 0;">Potential cancerous tissue detected</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    else:
-                        st.markdown("""
-                        <div style="background-color: #e8f5e9; padding: 1.5rem; border-radius: 10px; border-left: 5px solid #4caf50;">
-                            <h3 style="color: #2e7d32; margin: 0;">✅ Negative Detection</h3>
-                            <p style="margin: 0.5rem 0 0 0;">No cancerous tissue detected</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    
-                    st.markdown("<br>", unsafe_allow_html=True)
-                    
-                    # Metrics display
-                    col_a, col_b = st.columns(2)
-                    with col_a:
-                        st.metric(
-                            "Confidence Score",
-                            f"{score:.4f}",
-                            delta=f"{(score - threshold):.4f} vs threshold"
-                        )
-                    with col_b:
-                        st.metric(
-                            "Classification",
-                            prediction,
-                            delta="High Risk" if prediction == "Cancer" else "Low Risk"
-                        )
-                    
-                    # Additional info
-                    with st.expander("📊 Technical Details"):
-                        st.write(f"**Model Threshold:** {threshold:.4f}")
-                        st.write(f"**Confidence Score:** {score:.4f}")
-                        st.write(f"**Classification Logic:** Score > Threshold = Cancer")
-                        st.write(f"**Response Time:** ~1-2 seconds")
-                    
-                    st.info("💡 **Remember:** This is a demonstration tool. Always consult healthcare professionals for medical diagnosis.")
-                
-                except requests.exceptions.Timeout:
-                    progress_bar.empty()
-                    status_text.empty()
-                    st.error("⏱️ Request timeout. The server took too long to respond. Please try again.")
-                
-                except requests.exceptions.ConnectionError:
-                    progress_bar.empty()
-                    status_text.empty()
-                    st.error("🔌 Connection Error: Cannot reach the backend server. Please ensure the API is running.")
+        if uploaded_files:
+            # Predictions are remembered for the rest of the session, keyed by
+            # a hash of each image's bytes. Reruns (e.g. opening an expander)
+            # show them again, and re-analyzing an image skips the API call.
+            prediction_cache = st.session_state.setdefault("prediction_cache", {})
+            # `getbuffer` hashes the upload in place, without copying its bytes.
+            file_keys = [prediction_key(f.getbuffer()) for f in uploaded_files]
+            
+            is_batch = len(uploaded_files) > 1
+            if submitted:
+                pending = [
+                    (uploaded_file, key) for uploaded_file, key in zip(uploaded_files, file_keys)
+                    if key not in prediction_cache
+                ]
+                if pending:
+                    request_prediction(ctx, pending, prediction_cache)
+            
+            if all(key in prediction_cache for key in file_keys):
+                results = [prediction_cache[key] for key in file_keys]
                 
-                except requests.exceptions.RequestException as e:
-                    progress_bar.empty()
-                    status_text.empty()
-                    st.error(f"❌ API Error: {str(e)}")
+                # Display results with better formatting
+                if is_batch:
+                    # Results are kept in upload order; lay them out in a grid.
+                    for start in range(0, len(results), RESULT_GRID_COLUMNS):
+                        grid = st.columns(RESULT_GRID_COLUMNS)
+                        batch = zip(grid, uploaded_files[start:], results[start:start + RESULT_GRID_COLUMNS])
+                        for column, uploaded_file, file_result in batch:
+                            with column:
+                                st.image(
+                                    make_preview(uploaded_file.getvalue(), uploaded_file.name),
+                                    caption=uploaded_file.name,
+                                    use_column_width=True
+                                )
+                                show_prediction_result(file_result, compact=True)
+                else:
+                    show_prediction_result(results[0])
                 
-                except Exception as e:
-                    progress_bar.empty()
-                    status_text.empty()
-                    st.error(f"❌ Unexpected error: {str(e)}")
+                st.info("💡 **Remember:** This is a demonstration tool. Always consult healthcare professionals for medical diagnosis.")
         else:
             st.info("👈 Upload an image to begin analysis")
 
 
 # --- Main App with Enhanced Navigation ---
 def main():
+    # The CSS is sent on every rerun: Streamlit only keeps the elements a run
+    # draws, so injecting it once inside bootstrap() would drop the styling.
+    st.markdown(_CSS, unsafe_allow_html=True)
+    
     # Sidebar styling
     st.sidebar.markdown("""
         <div style="text-align: center; padding: 1rem;">